@@ -1,9 +1,14 @@
+import html
 import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from pathlib import Path
 from code import plots  # Importa las funciones de visualización desde el módulo 'code.plots'
+from code import paquete_datos  # Paquete binario con los datasets de visualización
+from code import cache_figuras  # Versiones memoizadas de los gráficos de 'code.plots'
+from code import recursos_imagenes  # Variantes WebP/PNG de las figuras estáticas
+from code import cubo_movilidad  # Agregados de movilidad filtrables por año, dependencia y bandas
 
 # Configuración de la página
 st.set_page_config(
@@ -216,6 +221,113 @@ class ImagesPath:
     figura8 = Path("images/figuras/22.png")
     figura9 = Path("images/figuras/23.png")
     figura10 = Path("images/figuras/24.png")
+
+    @staticmethod
+    def variante(path: Path, ancho: int, formato: str = 'png'):
+        """
+        URL de la variante de `path` más pequeña que cubre `ancho` píxeles, o `path` si no hay variantes
+        (manifiesto ausente o sin servidor de archivos estáticos).
+        """
+        if not st.get_option('server.enableStaticServing'):
+            return path
+        manifiesto = cargar_manifiesto_imagenes(recursos_imagenes.huella_figuras())
+        elegida = recursos_imagenes.elegir_variante(manifiesto, path.name, ancho, formato)
+        if elegida is None:
+            return path
+        return f"{recursos_imagenes.URL_STATIC}/figuras/{elegida['archivo']}"
+
+@st.cache_data(show_spinner=False)
+def cargar_datos_plots(huella: str) -> dict:
+    """
+    Carga los datasets de visualización una vez por proceso; cada ejecución recibe su propia copia,
+    de modo que modificar un DataFrame en una sección no afecta a otras sesiones.
+
+    `huella` identifica la versión de los CSV de `data/plots`; si cambian, se vuelve a cargar.
+    """
+    return paquete_datos.cargar_paquete()
+
+
+@st.cache_resource(show_spinner=False)
+def cargar_manifiesto_imagenes(huella: str) -> dict:
+    """
+    Manifiesto de variantes de las figuras (ver `recursos_imagenes.cargar_manifiesto`), uno por proceso.
+
+    `huella` identifica la versión de las figuras originales; si cambian, se regeneran las variantes.
+    """
+    return recursos_imagenes.cargar_manifiesto()
+
+
+@st.cache_resource(show_spinner=False)
+def cargar_cubo_movilidad(huella: str):
+    """
+    Cubo de movilidad filtrable (ver `cubo_movilidad.CuboMovilidad`), uno por proceso.
+
+    `huella` identifica la versión del archivo del cubo; retorna None si no se ha construido.
+    """
+    return cubo_movilidad.CuboMovilidad.cargar()
+
+
+# Etiquetas de los filtros de movilidad (dimensión del cubo -> texto del control)
+filtros_movilidad = {
+    'anio': "Año",
+    'tipo_inst_3': "Tipo de universidad",
+    'TIPO_DEPEN': "Dependencia del establecimiento",
+    'BANDA_PUNTAJE': "Puntaje (PROM_CM_ACTUAL)",
+    'BANDA_IVM': "IVM del establecimiento",
+}
+
+
+def seleccionar_filtros_movilidad(cubo) -> dict:
+    """
+    Controles de filtro para la sección de movilidad; una selección vacía no filtra esa dimensión.
+    """
+    filtros = {}
+    with st.expander("🔎 Filtrar matriz y tasas", expanded=False):
+        columnas = st.columns(len(cubo.dimensiones))
+        for columna, dimension in zip(columnas, cubo.dimensiones):
+            with columna:
+                seleccion = st.multiselect(
+                    filtros_movilidad.get(dimension, dimension),
+                    cubo.valores[dimension],
+                    format_func=lambda v, d=dimension: plots.tipodepen_dict.get(v, v) if d == 'TIPO_DEPEN' else str(v),
+                    key=f"filtro_{dimension}",
+                )
+            if seleccion:
+                filtros[dimension] = seleccion
+    return filtros
+
+
+def mostrar_figura(path: Path, caption: str, width: int = 800):
+    """
+    Muestra una figura estática con la variante adecuada a `width`.
+
+    Si hay variantes, el navegador elige entre WebP y PNG y entre los anchos disponibles (`srcset`)
+    y descarga la imagen solo cuando se vuelve visible (`loading="lazy"`), por lo que las figuras de
+    expanders cerrados no se descargan. Sin variantes, se usa `st.image` con la figura original.
+    """
+    url = ImagesPath.variante(path, width)
+    if isinstance(url, Path):
+        st.image(path, caption=caption, width=width)
+        return
+
+    manifiesto = cargar_manifiesto_imagenes(recursos_imagenes.huella_figuras())
+    url_base = f"{recursos_imagenes.URL_STATIC}/figuras"
+    # El texto va dentro de HTML sin sanitizar (unsafe_allow_html)
+    texto = html.escape(caption)
+    st.markdown(f'''
+    <figure style="margin: 0 0 1rem 0;">
+        <picture>
+            <source type="image/webp" sizes="{width}px"
+                    srcset="{recursos_imagenes.srcset(manifiesto, path.name, 'webp', url_base)}">
+            <img src="{url}" sizes="{width}px" width="{width}" style="max-width: 100%; height: auto;"
+                 srcset="{recursos_imagenes.srcset(manifiesto, path.name, 'png', url_base)}"
+                 loading="lazy" decoding="async" alt="{texto}">
+        </picture>
+        <figcaption style="font-size: 0.875rem; opacity: 0.6;">{texto}</figcaption>
+    </figure>
+    ''', unsafe_allow_html=True)
+
+
 def mostrar_sidebar():
     """
     Carga el contenido del panel lateral de la aplicación.
@@ -230,132 +342,192 @@ def mostrar_sidebar():
             st.markdown(SidebarText.objetivos, unsafe_allow_html=True)
             st.markdown(SidebarText.autores, unsafe_allow_html=True)
 
-def mostrar_cuerpo():
+# Si es True, solo se construye la sección seleccionada en cada ejecución (datos, figuras e imágenes);
+# si es False, se usan `st.tabs` y se construyen las cuatro secciones en cada ejecución.
+RENDERIZADO_DIFERIDO = True
+
+
+def mostrar_poblacion_objetivo(datos: dict):
     """
-    Cuerpo principal con tabs de navegación para GeoEdu Chile.
+    Sección 'Población Objetivo': tablas de cobertura y fuentes de datos.
     """
+    st.header("Población Objetivo")
 
-    st.title("🗺️ GeoEdu Chile: Exploración Territorial Universitaria")
-
-    # Tabs
-    tab1, tab2, tab3, tab4 = st.tabs([
-        "👥 Población Objetivo",
-        "🏛️ Contexto Institucional",
-        "🌍 Movilidad Interregional",
-        "📊 Ingreso Juvenil Regional"
-    ])
+    st.markdown(BodyText.tab1_tabla1, unsafe_allow_html=True)
+    tabla1 = datos['tabla1']
+    st.dataframe(tabla1, use_container_width=False)
 
-    with tab1:
-        st.header("Población Objetivo")
+    st.markdown(BodyText.tab1_tabla2, unsafe_allow_html=True)
+    tabla2 = datos['tabla2']
+    st.dataframe(tabla2, use_container_width=False)
 
-        st.markdown(BodyText.tab1_tabla1, unsafe_allow_html=True)
-        tabla1 = pd.read_csv("data/plots/tabla1.csv")
-        st.dataframe(tabla1, use_container_width=False)
+    st.header("Fuentes de Datos Utilizadas")
+    st.markdown(BodyText.tab1_fuentes1, unsafe_allow_html=True)
 
-        st.markdown(BodyText.tab1_tabla2, unsafe_allow_html=True)
-        tabla2 = pd.read_csv("data/plots/tabla2.csv")
-        st.dataframe(tabla2, use_container_width=False)
+    st.header("Conjuntos de Datos Iniciales y Complementarios")
+    st.markdown(BodyText.tab1_fuentes2, unsafe_allow_html=True)
 
-        st.header("Fuentes de Datos Utilizadas")
-        st.markdown(BodyText.tab1_fuentes1, unsafe_allow_html=True)
 
-        st.header("Conjuntos de Datos Iniciales y Complementarios")
-        st.markdown(BodyText.tab1_fuentes2, unsafe_allow_html=True)
+    st.markdown(BodyText.tab1_tabla4, unsafe_allow_html=True)
+    tabla4 = datos['tabla4']
+    st.dataframe(tabla4, use_container_width=False)
 
 
-        st.markdown(BodyText.tab1_tabla4, unsafe_allow_html=True)
-        tabla4 = pd.read_csv("data/plots/tabla4.csv")
-        st.dataframe(tabla4, use_container_width=False)
+def mostrar_contexto_institucional(datos: dict):
+    """
+    Sección 'Contexto Institucional': tipo de universidad, dependencia e IVM por región.
+    """
+    st.header("Contexto Institucional")
+    st.markdown("Explora la distribución de instituciones universitarias por tipo y dependencia.")
 
-    with tab2:
-        st.header("Contexto Institucional")
-        st.markdown("Explora la distribución de instituciones universitarias por tipo y dependencia.")
+    df_tipo = datos['df_tipo_universidad']
+    df_dep = datos['df_tipodepen']
 
-        df_tipo = pd.read_csv("data/plots/df_tipo_universidad.csv")
-        df_dep = pd.read_csv("data/plots/df_tipodepen.csv")
+    
+    st.markdown(BodyText.tab2_fig1, unsafe_allow_html=True)
 
-        
-        st.markdown(BodyText.tab2_fig1, unsafe_allow_html=True)
+    st.plotly_chart(cache_figuras.plotly_tipo_universidad_por_region(df_tipo), use_container_width=False)
 
-        st.plotly_chart(plots.plotly_tipo_universidad_por_region(df_tipo), use_container_width=False)
+    st.markdown(BodyText.tab2_fig2, unsafe_allow_html=True)
 
-        st.markdown(BodyText.tab2_fig2, unsafe_allow_html=True)
+    st.plotly_chart(cache_figuras.plotly_tipodepen_por_region(df_dep), use_container_width=True)
 
-        st.plotly_chart(plots.plotly_tipodepen_por_region(df_dep), use_container_width=True)
+    st.markdown(BodyText.tab2_fig3, unsafe_allow_html=True)
 
-        st.markdown(BodyText.tab2_fig3, unsafe_allow_html=True)
+    df_ivm = datos['df_ivm']
+    st.plotly_chart(cache_figuras.plotly_ivm_por_region(df_ivm), use_container_width=True)
 
-        df_ivm = pd.read_csv("data/plots/df_ivm.csv")
-        st.plotly_chart(plots.plotly_ivm_por_region(df_ivm), use_container_width=True)
 
-    with tab3:
-        st.header("Movilidad Interregional")
+def mostrar_movilidad_interregional(datos: dict):
+    """
+    Sección 'Movilidad Interregional': matriz de movilidad, tasas y distancias.
+    """
+    st.header("Movilidad Interregional")
+
+    matriz = datos['df_matriz_movilidad']
+    df_tasas = datos['df_tasas_migracion']
+    df_dist = datos['df_migracion_distancia']
+
+    # Con el cubo construido, la matriz y las tasas salen siempre del cubo (también sin filtros), de modo
+    # que filtrar no cambia el alcance de los datos (set_abcde de los años del cubo)
+    cubo = cargar_cubo_movilidad(cubo_movilidad.huella_cubo())
+    if cubo is not None:
+        filtros = seleccionar_filtros_movilidad(cubo)
+        filtrados = cubo.datasets(**filtros)
+        matriz = filtrados['matriz']
+        df_tasas = filtrados['tasas']
+        df_dist = filtrados['migracion_distancia']
+        anios = filtros.get('anio', cubo.valores.get('anio'))
+        if anios:
+            st.caption(f"Estudiantes de set_abcde, años {', '.join(map(str, anios))}.")
+
+
+    st.markdown(BodyText.tab3_fig1, unsafe_allow_html=True)
+    st.plotly_chart(cache_figuras.plotly_matriz_movilidad(matriz), use_container_width=True)
+
+    st.markdown(BodyText.tab3_fig2, unsafe_allow_html=True)
+    st.plotly_chart(cache_figuras.plotly_tasas_migracion_recepcion(df_tasas), use_container_width=True)
+    col1, col2 = st.columns(2)
+
+    with col1:
+        st.plotly_chart(cache_figuras.plotly_migracion_vs_distancia(df_dist), use_container_width=True)
+
+    with col2:
+        st.plotly_chart(cache_figuras.plotly_tasa_vs_distancia(
+            df_dist,
+            col_x="DISTANCIA_PROMEDIO_RECEPCIÓN",
+            col_y="Tasa Recepción (%)",
+            titulo="Tasa de Recepción vs Distancia Promedio de Recepción",
+            color="orange"
+        ), use_container_width=True)
+
+
+def mostrar_ingreso_juvenil(datos: dict):
+    """
+    Sección 'Ingreso Juvenil Regional': figuras estáticas del análisis por grupos de regiones.
+    """
+    st.header("Ingreso Juvenil Regional")
 
-        matriz = pd.read_csv("data/plots/df_matriz_movilidad.csv", index_col=0)
-        df_tasas = pd.read_csv("data/plots/df_tasas_migracion.csv")
-        df_dist = pd.read_csv("data/plots/df_migracion_distancia.csv")
+    st.markdown(BodyText.tab4_fig1)
+    st.markdown(BodyText.tab4_fig2)
+    mostrar_figura(ImagesPath.figura1, caption="Agrupación de regiones por características similares", width=800)
 
+    with st.expander("📈 Puntajes de pruebas y ranking"):
+      st.markdown(BodyText.tab4_fig4)
+      mostrar_figura(ImagesPath.figura3, caption="Puntaje pruebas obligatorias (egresados/as)", width=800)
 
-        st.markdown(BodyText.tab3_fig1, unsafe_allow_html=True)
-        st.plotly_chart(plots.plotly_matriz_movilidad(matriz), use_container_width=True)
+      st.markdown(BodyText.tab4_fig5)
+      mostrar_figura(ImagesPath.figura4, caption="Puntaje ranking (matriculados/as)", width=800)
 
-        st.markdown(BodyText.tab3_fig2, unsafe_allow_html=True)
-        st.plotly_chart(plots.plotly_tasas_migracion_recepcion(df_tasas), use_container_width=True)
-        col1, col2 = st.columns(2)
+      st.markdown(BodyText.tab4_fig6)
+      mostrar_figura(ImagesPath.figura5, caption="Puntaje ranking (egresados/as)", width=800)
 
-        with col1:
-            st.plotly_chart(plots.plotly_migracion_vs_distancia(df_dist), use_container_width=True)
+    with st.expander("📍 Distancia de desplazamiento"):
+        st.markdown(BodyText.tab4_fig7)
+        mostrar_figura(ImagesPath.figura6, caption="Distancia de desplazamiento (matriculados/as)", width=800)
 
-        with col2:
-            st.plotly_chart(plots.plotly_tasa_vs_distancia(
-                df_dist,
-                col_x="DISTANCIA_PROMEDIO_RECEPCIÓN",
-                col_y="Tasa Recepción (%)",
-                titulo="Tasa de Recepción vs Distancia Promedio de Recepción",
-                color="orange"
-            ), use_container_width=True)
+        st.markdown(BodyText.tab4_fig8)
+        mostrar_figura(ImagesPath.figura7, caption="Distancia de desplazamiento (egresados/as)", width=800)
 
-    with tab4:
-        st.header("Ingreso Juvenil Regional")
+    with st.expander("🏫 Tasa Recepción, migración y vulnerabilidad"):
+        st.markdown(BodyText.tab4_fig9)
+        mostrar_figura(ImagesPath.figura8, caption="Tasa de recepción por región", width=800)
 
-        st.markdown(BodyText.tab4_fig1)
-        st.markdown(BodyText.tab4_fig2)
-        st.image(ImagesPath.figura1, caption="Agrupación de regiones por características similares",width=800)
+        st.markdown(BodyText.tab4_fig10)
+        mostrar_figura(ImagesPath.figura9, caption="Tasa de migración por región", width=800)
 
-        with st.expander("📈 Puntajes de pruebas y ranking"):
-          st.markdown(BodyText.tab4_fig4)
-          st.image(ImagesPath.figura3, caption="Puntaje pruebas obligatorias (egresados/as)",width=800)
+        st.markdown(BodyText.tab4_fig11)
+        mostrar_figura(ImagesPath.figura10, caption="Porcentaje de alta vulnerabilidad por región", width=800)
 
-          st.markdown(BodyText.tab4_fig5)
-          st.image(ImagesPath.figura4, caption="Puntaje ranking (matriculados/as)",width=800)
 
-          st.markdown(BodyText.tab4_fig6)
-          st.image(ImagesPath.figura5, caption="Puntaje ranking (egresados/as)",width=800)
+# Secciones del cuerpo en orden de navegación (etiqueta -> función que la construye)
+secciones = {
+    "👥 Población Objetivo": mostrar_poblacion_objetivo,
+    "🏛️ Contexto Institucional": mostrar_contexto_institucional,
+    "🌍 Movilidad Interregional": mostrar_movilidad_interregional,
+    "📊 Ingreso Juvenil Regional": mostrar_ingreso_juvenil,
+}
 
-        with st.expander("📍 Distancia de desplazamiento"):
-            st.markdown(BodyText.tab4_fig7)
-            st.image(ImagesPath.figura6, caption="Distancia de desplazamiento (matriculados/as)",width=800)
 
-            st.markdown(BodyText.tab4_fig8)
-            st.image(ImagesPath.figura7, caption="Distancia de desplazamiento (egresados/as)",width=800)
+def seleccionar_seccion() -> str:
+    """
+    Control de navegación entre secciones; la selección se conserva en `st.session_state`.
+    """
+    etiquetas = list(secciones)
+    if hasattr(st, 'segmented_control'):
+        seleccion = st.segmented_control("Sección", etiquetas, default=etiquetas[0],
+                                         key='seccion', label_visibility='collapsed')
+    else:
+        seleccion = st.radio("Sección", etiquetas, horizontal=True, key='seccion',
+                             label_visibility='collapsed')
+    # `segmented_control` permite deseleccionar el botón activo: se vuelve a la primera sección
+    return seleccion or etiquetas[0]
 
-        with st.expander("🏫 Tasa Recepción, migración y vulnerabilidad"):
-            st.markdown(BodyText.tab4_fig9)
-            st.image(ImagesPath.figura8, caption="Tasa de recepción por región",width=800)
 
-            st.markdown(BodyText.tab4_fig10)
-            st.image(ImagesPath.figura9, caption="Tasa de migración por región",width=800)
+def mostrar_cuerpo():
+    """
+    Cuerpo principal con navegación por secciones para GeoEdu Chile.
 
-            st.markdown(BodyText.tab4_fig11)
-            st.image(ImagesPath.figura10, caption="Porcentaje de alta vulnerabilidad por región",width=800)
+    Con `RENDERIZADO_DIFERIDO`, solo se ejecuta la función de la sección seleccionada: las demás no
+    leen datos, no construyen figuras ni cargan imágenes hasta que se eligen.
+    """
 
+    st.title("🗺️ GeoEdu Chile: Exploración Territorial Universitaria")
 
+    datos = cargar_datos_plots(paquete_datos.huella_fuentes())
 
+    if RENDERIZADO_DIFERIDO:
+        secciones[seleccionar_seccion()](datos)
+    else:
+        for tab, mostrar_seccion in zip(st.tabs(list(secciones)), secciones.values()):
+            with tab:
+                mostrar_seccion(datos)
 
     # Estilos visuales
     estilos_css = '''
     <style>
-        .stTabs [data-baseweb="tab-list"] button [data-testid="stMarkdownContainer"] p {
+        .stTabs [data-baseweb="tab-list"] button [data-testid="stMarkdownContainer"] p,
+        .stElementContainer [data-testid="stButtonGroup"] button p {
             font-size: 1.3rem;
         }
     </style>
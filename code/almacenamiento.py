@@ -0,0 +1,318 @@
+import re
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+
+# Esquemas explícitos por conjunto (columna -> dtype de pandas).
+# Las coordenadas, el IVM y la distancia se mantienen en float64 para no alterar cálculos ni umbrales.
+esquema_a = {
+    'mrun': 'Int32',
+    'region_sede': 'category',
+    'provincia_sede': 'category',
+    'comuna_sede': 'category',
+    'cod_inst': 'Int32',
+    'nomb_inst': 'category',
+    'nomb_carrera': 'category',
+    'tipo_inst_1': 'category',
+    'tipo_inst_2': 'category',
+    'tipo_inst_3': 'category',
+    'nivel_global': 'category',
+    'nivel_carrera_1': 'category',
+    'anio_ing_carr_act': 'Int16',
+    'anio_ing_carr_ori': 'Int16',
+    'forma_ingreso': 'category',
+    'rango_edad': 'category',
+    'NOMBRE_REGION_INGRESO': 'category',
+}
+
+esquema_b = {
+    'mrun': 'Int32',
+    'RBD': 'Int32',
+    'CODIGO_REGION_EGRESO': 'Int8',
+    'NOMBRE_REGION_EGRESO': 'category',
+    'PTJE_RANKING': 'float32',
+    'PTJE_NEM': 'float32',
+    'PROM_CM_ACTUAL': 'float32',
+}
+
+esquema_c = {
+    'RBD': 'Int32',
+    'NOM_RBD': 'category',
+    'COD_REG_RB': 'Int8',
+    'TIPO_DEPEN': 'Int8',
+    'LATITUD_COL': 'float64',
+    'LONGITUD_COL': 'float64',
+    'NOMBRE_SEDE_CERCANA': 'category',
+    'DISTANCIA_SEDE_CERCANA': 'float64',
+}
+
+esquema_d = {
+    'NOMBRE_INS': 'category',
+    'REGIÓN': 'category',
+    'COMUNA': 'category',
+    'LATITUD_UNI': 'float64',
+    'LONGITUD_UNI': 'float64',
+    'TIPO_INST': 'category',
+}
+
+esquema_e = {
+    'ID_RBD': 'Int32',
+    'N EVALUADO': 'Int32',
+    'IVM Bajo': 'Int32',
+    'IVM Medio': 'Int32',
+    'IVM Alto': 'Int32',
+    'IVM Muy Alto': 'Int32',
+    'IVM_Establecimiento': 'float64',
+    'valor_corte': 'float64',
+}
+
+esquemas_sets = {
+    'set_a': esquema_a,
+    'set_a0': esquema_a,
+    'set_aa': esquema_a,
+    'set_a1': esquema_a,
+    'set_b': esquema_b,
+    'set_c': esquema_c,
+    'set_d': esquema_d,
+    'set_e': esquema_e,
+    'set_ab': {**esquema_b, **esquema_a},
+    'set_abc': {**esquema_b, **esquema_a, **esquema_c},
+    'set_abcd': {**esquema_b, **esquema_a, **esquema_c, **esquema_d},
+    'set_abcde': {**esquema_b, **esquema_a, **esquema_c, **esquema_d, **esquema_e, 'DISTANCIA': 'float64'},
+}
+
+# Columna de región usada por defecto para el filtro `regiones` de cada conjunto
+columna_region_sets = {
+    'set_a': 'NOMBRE_REGION_INGRESO',
+    'set_a0': 'NOMBRE_REGION_INGRESO',
+    'set_aa': 'NOMBRE_REGION_INGRESO',
+    'set_a1': 'NOMBRE_REGION_INGRESO',
+    'set_b': 'NOMBRE_REGION_EGRESO',
+    'set_c': 'COD_REG_RB',
+    'set_d': 'REGIÓN',
+    'set_ab': 'NOMBRE_REGION_EGRESO',
+    'set_abc': 'NOMBRE_REGION_EGRESO',
+    'set_abcd': 'NOMBRE_REGION_EGRESO',
+    'set_abcde': 'NOMBRE_REGION_EGRESO',
+}
+
+# Claves de unión que en ABCDE repiten otra columna (ID_RBD = RBD). NOMBRE_INS, REGIÓN y COMUNA
+# se conservan: indican si la sede se encontró en el set D y, con el crosswalk difuso, con qué nombre
+columnas_redundantes_sets = {
+    'set_abcde': ['ID_RBD'],
+}
+
+# Fracción máxima de valores distintos para convertir una columna de texto fuera del esquema en categórica
+FRACCION_MAX_CATEGORIAS = 0.5
+
+FILAS_POR_GRUPO = 65_536
+
+
+def _a_numerico(serie: pd.Series) -> pd.Series:
+    """
+    Convierte una columna a numérico, aceptando coma como separador decimal en columnas de texto.
+    """
+    if pd.api.types.is_numeric_dtype(serie):
+        return serie
+    return pd.to_numeric(serie.astype('string').str.replace(',', '.', regex=False), errors='coerce')
+
+
+def aplicar_esquema(df: pd.DataFrame, nombre_set: str) -> pd.DataFrame:
+    """
+    Convierte las columnas de un conjunto a los tipos definidos en `esquemas_sets`.
+
+    Parámetros:
+    -----------
+    df : pd.DataFrame
+        Conjunto a tipar. Las columnas fuera del esquema se mantienen sin cambios.
+    nombre_set : str
+        Nombre del conjunto (por ejemplo 'set_abcde').
+
+    Retorna:
+    --------
+    pd.DataFrame
+        Copia del DataFrame con los tipos del esquema.
+    """
+    if nombre_set not in esquemas_sets:
+        raise ValueError(f"Conjunto sin esquema definido: {nombre_set!r}. Opciones: {list(esquemas_sets)}")
+
+    df = pd.DataFrame(df).copy()
+    for columna, dtype in esquemas_sets[nombre_set].items():
+        if columna not in df.columns:
+            continue
+        if dtype == 'category':
+            df[columna] = df[columna].astype('category')
+        else:
+            df[columna] = _a_numerico(df[columna]).astype(dtype)
+
+    return df
+
+
+def memoria_mb(df: pd.DataFrame) -> float:
+    """
+    Memoria usada por un DataFrame en MB (incluye el contenido de las columnas de texto).
+    """
+    return df.memory_usage(deep=True).sum() / 2**20
+
+
+def optimizar_tipos(df: pd.DataFrame,
+                    nombre_set: str,
+                    eliminar_redundantes: bool = True,
+                    reportar: bool = True) -> pd.DataFrame:
+    """
+    Reduce la memoria de un conjunto: elimina claves de unión redundantes, aplica el esquema y
+    compacta las columnas que no están en él.
+
+    Fuera del esquema, las columnas de texto con pocos valores distintos pasan a categóricas y las
+    enteras se reducen al menor tipo que las contiene. Los flotantes fuera del esquema no se tocan.
+
+    Parámetros:
+    -----------
+    df : pd.DataFrame
+        Conjunto a optimizar.
+    nombre_set : str
+        Nombre del conjunto (define el esquema y las columnas redundantes).
+    eliminar_redundantes : bool
+        Si es True, elimina las columnas de `columnas_redundantes_sets`.
+    reportar : bool
+        Si es True, imprime la memoria antes y después.
+
+    Retorna:
+    --------
+    pd.DataFrame
+        Copia optimizada del conjunto.
+    """
+    antes = memoria_mb(df) if reportar else None
+
+    redundantes = columnas_redundantes_sets.get(nombre_set, []) if eliminar_redundantes else []
+    df = aplicar_esquema(df.drop(columns=[c for c in redundantes if c in df.columns]), nombre_set)
+
+    esquema = esquemas_sets[nombre_set]
+    for columna in df.columns:
+        if columna in esquema:
+            continue
+        serie = df[columna]
+        if pd.api.types.is_object_dtype(serie) or pd.api.types.is_string_dtype(serie):
+            if serie.nunique() <= FRACCION_MAX_CATEGORIAS * len(serie):
+                df[columna] = serie.astype('category')
+        elif pd.api.types.is_integer_dtype(serie) and not pd.api.types.is_extension_array_dtype(serie):
+            df[columna] = pd.to_numeric(serie, downcast='integer')
+
+    if reportar:
+        despues = memoria_mb(df)
+        print(f"{nombre_set}: {antes:.1f} MB -> {despues:.1f} MB "
+              f"({len(redundantes)} columnas redundantes eliminadas)")
+
+    return df
+
+
+def escribir_set_parquet(df: pd.DataFrame, nombre_set: str, output_path) -> Path:
+    """
+    Escribe un conjunto limpio en formato Parquet, tipado y compactado con `optimizar_tipos`.
+
+    Las filas se ordenan por la columna de región del conjunto para que las estadísticas
+    de cada grupo de filas permitan descartar bloques completos al filtrar por región.
+
+    Parámetros:
+    -----------
+    df : pd.DataFrame
+        Conjunto a guardar.
+    nombre_set : str
+        Nombre del conjunto (define el esquema y el nombre del archivo).
+    output_path : str o Path
+        Carpeta del año (por ejemplo `data/clean/2021`).
+
+    Retorna:
+    --------
+    Path
+        Ruta del archivo escrito.
+    """
+    df = optimizar_tipos(df, nombre_set)
+
+    columna_region = columna_region_sets.get(nombre_set)
+    if columna_region in df.columns:
+        df = df.sort_values(columna_region, kind='stable')
+
+    path = Path(output_path) / f"{nombre_set}.parquet"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    df.to_parquet(path, engine='pyarrow', index=False, compression='zstd', row_group_size=FILAS_POR_GRUPO)
+
+    return path
+
+
+def leer_set_parquet(path_base,
+                     nombre_set: str,
+                     anios: list = None,
+                     columnas: list = None,
+                     regiones: list = None,
+                     columna_region: str = None,
+                     filtros: list = None) -> pd.DataFrame:
+    """
+    Lee un conjunto limpio en Parquet para uno o más años, con proyección de columnas y filtros.
+
+    El filtro por año se resuelve a nivel de archivo (solo se abren las carpetas pedidas) y el
+    filtro por región se delega a pyarrow, que omite los grupos de filas que no lo cumplen.
+
+    Parámetros:
+    -----------
+    path_base : str o Path
+        Carpeta `clean` con una subcarpeta por año.
+    nombre_set : str
+        Nombre del conjunto (por ejemplo 'set_abcde').
+    anios : list, opcional
+        Años a leer. Por defecto, todos los disponibles.
+    columnas : list, opcional
+        Columnas a leer. Por defecto, todas.
+    regiones : list, opcional
+        Valores de región a conservar.
+    columna_region : str, opcional
+        Columna sobre la que se aplica `regiones`. Por defecto, la de `columna_region_sets`.
+    filtros : list, opcional
+        Filtros adicionales en formato pyarrow, por ejemplo `[('TIPO_DEPEN', '==', 3)]`.
+
+    Retorna:
+    --------
+    pd.DataFrame
+        Conjunto tipado (ver `optimizar_tipos`) con una columna adicional 'anio'.
+    """
+    path_base = Path(path_base)
+    if anios is None:
+        anios = sorted(int(p.name) for p in path_base.iterdir() if re.fullmatch(r'\d{4}', p.name))
+
+    condiciones = list(filtros or [])
+    if regiones is not None:
+        columna_region = columna_region or columna_region_sets[nombre_set]
+        condiciones.append((columna_region, 'in', list(regiones)))
+
+    if columnas is not None and condiciones:
+        # pyarrow necesita leer las columnas filtradas aunque no se pidan
+        columnas_lectura = list(dict.fromkeys(list(columnas) + [c[0] for c in condiciones]))
+    else:
+        columnas_lectura = columnas
+
+    frames = []
+    for anio in anios:
+        path = path_base / str(anio) / f"{nombre_set}.parquet"
+        if not path.exists():
+            continue
+        df = pd.read_parquet(path, engine='pyarrow', columns=columnas_lectura, filters=condiciones or None)
+        if columnas is not None:
+            df = df[list(columnas)]
+        df['anio'] = np.int16(anio)
+        frames.append(df)
+
+    if not frames:
+        raise FileNotFoundError(f"No se encontró {nombre_set}.parquet en {path_base} para los años {anios}")
+
+    # Unificar categorías entre años antes de concatenar
+    categoricas = [c for c in frames[0].columns if isinstance(frames[0][c].dtype, pd.CategoricalDtype)]
+    if len(frames) > 1 and categoricas:
+        for columna in categoricas:
+            if all(f[columna].dtype == frames[0][columna].dtype for f in frames):
+                continue
+            union = pd.api.types.union_categoricals([f[columna] for f in frames], ignore_order=True)
+            for f in frames:
+                f[columna] = f[columna].cat.set_categories(union.categories)
+
+    return optimizar_tipos(pd.concat(frames, ignore_index=True), nombre_set, reportar=False)
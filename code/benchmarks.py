@@ -0,0 +1,206 @@
+"""
+Benchmarks de las rutas vectorizadas frente a las implementaciones fila a fila.
+
+Uso:
+    python code/benchmarks.py
+"""
+import time
+import numpy as np
+import pandas as pd
+
+try:
+    from . import distancias
+    from . import plots
+except ImportError:
+    import distancias
+    import plots
+
+
+def _medir(funcion, repeticiones: int = 3) -> float:
+    """
+    Retorna el menor tiempo (en segundos) de varias ejecuciones de `funcion`.
+    """
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return min(tiempos)
+
+
+def generar_coordenadas_sinteticas(n: int = 300_000, fraccion_nan: float = 0.01, seed: int = 0) -> pd.DataFrame:
+    """
+    Genera un DataFrame con coordenadas de establecimientos y sedes dentro de Chile continental.
+
+    Parámetros:
+    -----------
+    n : int
+        Cantidad de filas.
+    fraccion_nan : float
+        Fracción de filas con coordenadas de sede faltantes.
+    seed : int
+        Semilla aleatoria.
+
+    Retorna:
+    --------
+    pd.DataFrame
+        DataFrame con columnas 'LATITUD_COL', 'LONGITUD_COL', 'LATITUD_UNI' y 'LONGITUD_UNI'.
+    """
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'LATITUD_COL': rng.uniform(-55.0, -17.5, n),
+        'LONGITUD_COL': rng.uniform(-75.0, -67.0, n),
+        'LATITUD_UNI': rng.uniform(-55.0, -17.5, n),
+        'LONGITUD_UNI': rng.uniform(-75.0, -67.0, n),
+    })
+    faltantes = rng.random(n) < fraccion_nan
+    df.loc[faltantes, ['LATITUD_UNI', 'LONGITUD_UNI']] = np.nan
+    return df
+
+
+def benchmark_distancias(n: int = 300_000, repeticiones: int = 3) -> pd.DataFrame:
+    """
+    Compara el cálculo de DISTANCIA fila a fila (`apply` + `math`) con la versión vectorizada.
+
+    Parámetros:
+    -----------
+    n : int
+        Cantidad de filas sintéticas.
+    repeticiones : int
+        Repeticiones por método (se reporta el mejor tiempo).
+
+    Retorna:
+    --------
+    pd.DataFrame
+        Tiempo en segundos y aceleración respecto a la ruta fila a fila.
+    """
+    df = generar_coordenadas_sinteticas(n)
+
+    def por_fila():
+        return df.apply(
+            lambda row: plots.haversine(row['LATITUD_COL'], row['LONGITUD_COL'], row['LATITUD_UNI'], row['LONGITUD_UNI']),
+            axis=1
+        )
+
+    referencia = por_fila().to_numpy()
+    vectorizado = distancias.calcular_distancia_columnas(df)
+    if not np.allclose(referencia, vectorizado, equal_nan=True):
+        raise AssertionError("La distancia vectorizada no coincide con la implementación fila a fila")
+
+    tiempos = {
+        'apply + math.haversine': _medir(por_fila, repeticiones=1),
+        'haversine_vectorizado': _medir(lambda: distancias.calcular_distancia_columnas(df), repeticiones),
+        'vincenty_vectorizado': _medir(lambda: distancias.calcular_distancia_columnas(df, metodo='vincenty'), repeticiones),
+    }
+
+    resultado = pd.DataFrame({'Tiempo (s)': tiempos})
+    resultado['Aceleración'] = tiempos['apply + math.haversine'] / resultado['Tiempo (s)']
+    return resultado
+
+
+def generar_cohorte_sintetica(n: int = 300_000, tasa_migracion: float = 0.2, seed: int = 0) -> pd.DataFrame:
+    """
+    Genera una cohorte sintética con región de egreso, región de ingreso y distancia.
+
+    Parámetros:
+    -----------
+    n : int
+        Cantidad de estudiantes.
+    tasa_migracion : float
+        Fracción de estudiantes que ingresan en una región distinta a la de egreso.
+    seed : int
+        Semilla aleatoria.
+
+    Retorna:
+    --------
+    pd.DataFrame
+        DataFrame con columnas 'NOMBRE_REGION_EGRESO', 'NOMBRE_REGION_INGRESO' y 'DISTANCIA'.
+    """
+    rng = np.random.default_rng(seed)
+    regiones = np.array(plots.orden_regiones, dtype=object)
+
+    egreso = rng.choice(regiones, n)
+    ingreso = egreso.copy()
+    migra = rng.random(n) < tasa_migracion
+    ingreso[migra] = rng.choice(regiones, migra.sum())
+
+    return pd.DataFrame({
+        'NOMBRE_REGION_EGRESO': egreso,
+        'NOMBRE_REGION_INGRESO': ingreso,
+        'DISTANCIA': np.where(migra, rng.uniform(50, 3000, n), rng.uniform(0, 50, n)),
+    })
+
+
+def calcular_distancias_promedio_por_fila(df_distancias, df_tasas):
+    """
+    Implementación original (iterrows + incrementos con .loc), usada como referencia.
+    """
+    df_resultado = df_tasas.copy()
+    df_resultado['DISTANCIA_PROMEDIO_MIGRACIÓN'] = 0.0
+    df_resultado['DISTANCIA_PROMEDIO_RECEPCIÓN'] = 0.0
+
+    migracion_count = {region: 0 for region in df_resultado['Región']}
+    recepcion_count = {region: 0 for region in df_resultado['Región']}
+
+    for _, row in df_distancias.iterrows():
+        egreso = row['NOMBRE_REGION_EGRESO']
+        ingreso = row['NOMBRE_REGION_INGRESO']
+        distancia = row['DISTANCIA']
+
+        if egreso != ingreso:
+            if egreso in migracion_count:
+                df_resultado.loc[df_resultado['Región'] == egreso, 'DISTANCIA_PROMEDIO_MIGRACIÓN'] += distancia
+                migracion_count[egreso] += 1
+            if ingreso in recepcion_count:
+                df_resultado.loc[df_resultado['Región'] == ingreso, 'DISTANCIA_PROMEDIO_RECEPCIÓN'] += distancia
+                recepcion_count[ingreso] += 1
+
+    df_resultado['DISTANCIA_PROMEDIO_MIGRACIÓN'] = df_resultado.apply(
+        lambda row: row['DISTANCIA_PROMEDIO_MIGRACIÓN'] / max(migracion_count.get(row['Región'], 1), 1), axis=1
+    )
+
+    df_resultado['DISTANCIA_PROMEDIO_RECEPCIÓN'] = df_resultado.apply(
+        lambda row: row['DISTANCIA_PROMEDIO_RECEPCIÓN'] / max(recepcion_count.get(row['Región'], 1), 1), axis=1
+    )
+
+    return df_resultado
+
+
+def benchmark_distancias_promedio(n: int = 300_000, repeticiones: int = 3) -> pd.DataFrame:
+    """
+    Compara `calcular_distancias_promedio` fila a fila con la versión agrupada de `plots`.
+
+    Parámetros:
+    -----------
+    n : int
+        Tamaño de la cohorte sintética.
+    repeticiones : int
+        Repeticiones de la versión agrupada (se reporta el mejor tiempo).
+
+    Retorna:
+    --------
+    pd.DataFrame
+        Tiempo en segundos y aceleración respecto a la ruta fila a fila.
+    """
+    df = generar_cohorte_sintetica(n)
+    df_tasas = plots.calcular_tasas_migracion(df)
+
+    inicio = time.perf_counter()
+    referencia = calcular_distancias_promedio_por_fila(df, df_tasas)
+    tiempo_por_fila = time.perf_counter() - inicio
+
+    pd.testing.assert_frame_equal(referencia, plots.calcular_distancias_promedio(df, df_tasas))
+
+    tiempos = {
+        'iterrows + .loc': tiempo_por_fila,
+        'groupby': _medir(lambda: plots.calcular_distancias_promedio(df, df_tasas), repeticiones),
+    }
+
+    resultado = pd.DataFrame({'Tiempo (s)': tiempos})
+    resultado['Aceleración'] = tiempos['iterrows + .loc'] / resultado['Tiempo (s)']
+    return resultado
+
+
+if __name__ == "__main__":
+    print(benchmark_distancias())
+    print(benchmark_distancias_promedio())
@@ -0,0 +1,138 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import pandas as pd
+
+
+# Extensiones que componen un shapefile (todas afectan el resultado de la lectura)
+extensiones_shapefile = ['.shp', '.shx', '.dbf', '.prj', '.cpg']
+
+
+def archivos_fuente(path) -> list:
+    """
+    Retorna los archivos que definen una fuente. Para un `.shp` incluye sus archivos asociados.
+    """
+    path = Path(path)
+    if path.suffix.lower() == '.shp':
+        return [path.with_suffix(ext) for ext in extensiones_shapefile if path.with_suffix(ext).exists()]
+    return [path]
+
+
+def huella_archivos(paths, bloque: int = 1 << 20) -> str:
+    """
+    Calcula un hash SHA-256 del contenido de uno o más archivos.
+
+    Parámetros:
+    -----------
+    paths : list
+        Archivos a considerar (en orden).
+    bloque : int
+        Tamaño de lectura en bytes.
+
+    Retorna:
+    --------
+    str
+        Hash hexadecimal.
+    """
+    h = hashlib.sha256()
+    for path in paths:
+        h.update(Path(path).name.encode('utf-8'))
+        with open(path, 'rb') as f:
+            for trozo in iter(lambda: f.read(bloque), b''):
+                h.update(trozo)
+    return h.hexdigest()
+
+
+def huella_mtime(paths) -> str:
+    """
+    Calcula una huella barata a partir del nombre, tamaño y fecha de modificación de los archivos.
+    """
+    partes = []
+    for path in paths:
+        estado = Path(path).stat()
+        partes.append(f"{Path(path).name}:{estado.st_size}:{estado.st_mtime_ns}")
+    return hashlib.sha256('|'.join(partes).encode('utf-8')).hexdigest()
+
+
+modos_huella = {
+    'hash': huella_archivos,
+    'mtime': huella_mtime,
+}
+
+
+def huella_dataframe(df: pd.DataFrame, index: bool = False) -> str:
+    """
+    Calcula un hash SHA-256 del contenido de un DataFrame (columnas, tipos y valores).
+
+    Con `index=True` también se considera el índice (por ejemplo, en matrices región x región).
+    """
+    h = hashlib.sha256()
+    h.update(json.dumps([[str(c) for c in df.columns], [str(t) for t in df.dtypes]]).encode('utf-8'))
+    h.update(pd.util.hash_pandas_object(df, index=index).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+def combinar_huellas(*huellas) -> str:
+    """
+    Combina varias huellas (o textos) en una sola, respetando el orden.
+    """
+    return hashlib.sha256('|'.join(str(x) for x in huellas).encode('utf-8')).hexdigest()
+
+
+def clave_cache(path_fuente, modo: str = 'hash', **parametros) -> str:
+    """
+    Construye la clave de caché a partir de la fuente y de los parámetros de lectura.
+
+    `modo` define cómo se identifica la fuente: 'hash' (contenido) o 'mtime' (tamaño y fecha).
+    """
+    if modo not in modos_huella:
+        raise ValueError(f"Modo de caché desconocido: {modo!r}. Opciones: {list(modos_huella)}")
+
+    h = hashlib.sha256()
+    h.update(modos_huella[modo](archivos_fuente(path_fuente)).encode('utf-8'))
+    h.update(json.dumps(parametros, sort_keys=True, default=str).encode('utf-8'))
+    return h.hexdigest()[:32]
+
+
+def leer_con_cache(path_fuente, lector, cache_dir, nombre: str, modo: str = 'hash', **parametros) -> pd.DataFrame:
+    """
+    Lee una fuente usando una caché en disco (Parquet) indexada por su contenido.
+
+    Si la fuente y los parámetros no cambiaron, se retorna la versión en caché sin ejecutar `lector`.
+
+    Parámetros:
+    -----------
+    path_fuente : str o Path
+        Archivo de origen (para `.shp` se consideran también `.shx`, `.dbf`, `.prj` y `.cpg`).
+    lector : callable
+        Función sin argumentos que lee y procesa la fuente; debe retornar un DataFrame.
+    cache_dir : str o Path
+        Carpeta donde se guardan los archivos en caché.
+    nombre : str
+        Prefijo del archivo en caché (por ejemplo 'set_c').
+    modo : str
+        'hash' (contenido de la fuente) o 'mtime' (tamaño y fecha de modificación, más rápido).
+    **parametros
+        Parámetros que afectan el resultado (por ejemplo la lista de columnas).
+
+    Retorna:
+    --------
+    pd.DataFrame
+        DataFrame leído desde la caché o desde la fuente.
+    """
+    cache_dir = Path(cache_dir)
+    path_cache = cache_dir / f"{nombre}_{clave_cache(path_fuente, modo, **parametros)}.parquet"
+
+    if path_cache.exists():
+        return pd.read_parquet(path_cache, engine='pyarrow')
+
+    df = pd.DataFrame(lector())
+
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    path_tmp = path_cache.with_suffix('.tmp')
+    df.to_parquet(path_tmp, engine='pyarrow')
+    os.replace(path_tmp, path_cache)
+
+    return df
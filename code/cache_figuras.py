@@ -0,0 +1,177 @@
+import functools
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import pandas as pd
+import plotly
+import plotly.io as pio
+
+try:
+    from . import cache
+    from . import plots
+except ImportError:
+    import cache
+    import plots
+
+
+class CacheFiguras:
+    """
+    Caché LRU de figuras Plotly serializadas como JSON, con persistencia opcional en disco.
+
+    Cada consulta reconstruye la figura desde el JSON, de modo que quien la reciba puede
+    modificarla (`update_layout`, ...) sin alterar la copia guardada. Los accesos están protegidos
+    con un lock porque Streamlit ejecuta las sesiones en hilos distintos.
+
+    Parámetros:
+    -----------
+    max_elementos : int
+        Cantidad máxima de figuras en memoria.
+    directorio : str o Path, opcional
+        Carpeta donde persistir las figuras como `<clave>.json`.
+    """
+
+    def __init__(self, max_elementos: int = 64, directorio=None):
+        self.max_elementos = max_elementos
+        self.directorio = Path(directorio) if directorio is not None else None
+        self._memoria = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obtener(self, clave: str):
+        """
+        Retorna una figura nueva construida desde el JSON guardado, o None si no está en caché.
+        """
+        with self._lock:
+            texto = self._memoria.get(clave)
+            if texto is not None:
+                self._memoria.move_to_end(clave)
+
+        if texto is None and self.directorio is not None:
+            path = self.directorio / f"{clave}.json"
+            if path.exists():
+                texto = path.read_text(encoding='utf-8')
+                self._guardar_en_memoria(clave, texto)
+
+        return pio.from_json(texto) if texto is not None else None
+
+    def guardar(self, clave: str, figura) -> None:
+        """
+        Guarda el JSON de una figura en memoria y, si corresponde, en disco.
+        """
+        texto = figura.to_json()
+        self._guardar_en_memoria(clave, texto)
+
+        if self.directorio is not None:
+            self.directorio.mkdir(parents=True, exist_ok=True)
+            (self.directorio / f"{clave}.json").write_text(texto, encoding='utf-8')
+
+    def limpiar(self, disco: bool = False) -> None:
+        """
+        Vacía la caché en memoria y, con `disco=True`, también los archivos persistidos.
+        """
+        with self._lock:
+            self._memoria.clear()
+        if disco and self.directorio is not None and self.directorio.exists():
+            for path in self.directorio.glob('*.json'):
+                path.unlink()
+
+    def _guardar_en_memoria(self, clave: str, texto: str) -> None:
+        with self._lock:
+            self._memoria[clave] = texto
+            self._memoria.move_to_end(clave)
+            while len(self._memoria) > self.max_elementos:
+                self._memoria.popitem(last=False)
+
+
+# Caché compartida por defecto (solo memoria)
+cache_global = CacheFiguras()
+
+
+def _huella_argumento(valor) -> str:
+    """
+    Representación estable de un argumento para la clave de caché.
+    """
+    if isinstance(valor, pd.DataFrame):
+        return 'df:' + cache.huella_dataframe(valor, index=True)
+    if isinstance(valor, pd.Series):
+        return 'serie:' + cache.huella_dataframe(valor.to_frame(), index=True)
+    return 'valor:' + json.dumps(valor, sort_keys=True, default=repr)
+
+
+def _huella_codigo(codigo) -> str:
+    """
+    Huella de un objeto de código: bytecode, constantes (títulos, colores, ...) y nombres usados,
+    incluyendo los de funciones anidadas.
+    """
+    partes = [codigo.co_code.hex(), repr(codigo.co_names)]
+    for constante in codigo.co_consts:
+        if hasattr(constante, 'co_code'):
+            partes.append(_huella_codigo(constante))
+        elif isinstance(constante, frozenset):
+            # El orden de iteración de un conjunto de textos cambia entre procesos
+            partes.append(repr(sorted(map(repr, constante))))
+        else:
+            partes.append(repr(constante))
+    return hashlib.sha256('|'.join(partes).encode('utf-8')).hexdigest()
+
+
+def clave_figura(funcion, args: tuple, kwargs: dict) -> str:
+    """
+    Clave de una figura: función (nombre, código y valores por defecto), versión de Plotly y huella
+    de los argumentos.
+    """
+    partes = [
+        f"{funcion.__module__}.{funcion.__qualname__}",
+        _huella_codigo(funcion.__code__),
+        repr(funcion.__defaults__),
+        repr(funcion.__kwdefaults__),
+        plotly.__version__,
+    ]
+    partes += [_huella_argumento(a) for a in args]
+    partes += [f"{k}={_huella_argumento(v)}" for k, v in sorted(kwargs.items())]
+    return cache.combinar_huellas(*partes)[:32]
+
+
+def memoizar_figura(funcion=None, cache_figuras: CacheFiguras = None):
+    """
+    Decorador que memoiza una función que retorna una figura Plotly.
+
+    Una nueva llamada con los mismos datos y parámetros evita la preparación de los datos y la
+    construcción de las trazas: la figura se reconstruye desde su JSON, y cada llamada recibe
+    una figura propia que puede modificar.
+
+    Parámetros:
+    -----------
+    funcion : callable
+        Función que construye la figura.
+    cache_figuras : CacheFiguras, opcional
+        Caché a utilizar. Por defecto, `cache_global`.
+    """
+    if funcion is None:
+        return functools.partial(memoizar_figura, cache_figuras=cache_figuras)
+
+    @functools.wraps(funcion)
+    def envoltura(*args, **kwargs):
+        destino = cache_figuras if cache_figuras is not None else cache_global
+        clave = clave_figura(funcion, args, kwargs)
+
+        figura = destino.obtener(clave)
+        if figura is None:
+            figura = funcion(*args, **kwargs)
+            destino.guardar(clave, figura)
+
+        return figura
+
+    return envoltura
+
+
+# Versiones memoizadas de los gráficos de `plots`
+plotly_tipo_universidad_por_region = memoizar_figura(plots.plotly_tipo_universidad_por_region)
+plotly_tipodepen_por_region = memoizar_figura(plots.plotly_tipodepen_por_region)
+plotly_ivm_por_region = memoizar_figura(plots.plotly_ivm_por_region)
+plotly_matriz_movilidad = memoizar_figura(plots.plotly_matriz_movilidad)
+plotly_tasas_migracion_recepcion = memoizar_figura(plots.plotly_tasas_migracion_recepcion)
+plotly_migracion_vs_distancia = memoizar_figura(plots.plotly_migracion_vs_distancia)
+plotly_tasa_vs_distancia = memoizar_figura(plots.plotly_tasa_vs_distancia)
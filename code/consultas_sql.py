@@ -0,0 +1,322 @@
+"""
+Consultas SQL (DuckDB) sobre los conjuntos limpios de todos los años, sin cargarlos en pandas.
+
+Cada conjunto `set_*` de `data/clean/<anio>` se expone como una vista con una columna adicional
+'anio' (Parquet si existe, CSV en otro caso). DuckDB lee solo las columnas que usa cada consulta,
+agrega en paralelo y puede usar disco si la memoria no alcanza; a pandas llegan solo los conteos,
+que se formatean con las mismas funciones de `plots`, de modo que los resultados tienen los mismos
+esquemas que `plots.preparar_dataset_tipo_universidad`, `preparar_dataset_tipodepen`,
+`preparar_dataset_ivm` y `preparar_matriz_movilidad` aplicadas a los años concatenados.
+
+DuckDB es opcional (`pip install duckdb`); el resto del proyecto no lo necesita.
+
+Uso:
+    python code/consultas_sql.py --clean data/clean --db data/clean/geoedu.duckdb
+"""
+import argparse
+import re
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+try:
+    from . import movilidad
+    from . import plots
+except ImportError:
+    import movilidad
+    import plots
+
+
+DIR_CLEAN = Path("data/clean")
+
+# Formatos en orden de preferencia cuando un año tiene el mismo conjunto en ambos
+formatos_sql = {
+    'parquet': "read_parquet('{path}')",
+    'csv': "read_csv('{path}', header = true)",
+}
+
+
+def _requerir_duckdb():
+    if duckdb is None:
+        raise ImportError("Las consultas SQL requieren DuckDB: pip install duckdb")
+
+
+def _literal(texto) -> str:
+    return "'" + str(texto).replace("'", "''") + "'"
+
+
+def archivos_sets(path_clean=DIR_CLEAN, anios: list = None) -> dict:
+    """
+    Archivos de cada conjunto por año, prefiriendo Parquet sobre CSV.
+
+    Retorna:
+    --------
+    dict
+        Nombre del conjunto -> lista de (anio, path, formato), ordenada por año.
+    """
+    path_clean = Path(path_clean)
+    if anios is None:
+        anios = sorted(int(p.name) for p in path_clean.iterdir() if re.fullmatch(r'\d{4}', p.name))
+
+    archivos = {}
+    for anio in anios:
+        encontrados = {}
+        for formato in formatos_sql:
+            for path in sorted((path_clean / str(anio)).glob(f"set_*.{formato}")):
+                encontrados.setdefault(path.stem, (int(anio), path.resolve(), formato))
+        for nombre_set, archivo in encontrados.items():
+            archivos.setdefault(nombre_set, []).append(archivo)
+    return archivos
+
+
+def conectar(path_clean=DIR_CLEAN,
+             path_db=None,
+             anios: list = None,
+             hilos: int = None,
+             memoria: str = None):
+    """
+    Abre una conexión DuckDB con una vista por conjunto limpio.
+
+    Las vistas solo guardan la consulta sobre los archivos: no copian datos, y si se usa `path_db`
+    quedan disponibles para otras sesiones (por ejemplo, desde la consola de DuckDB).
+
+    Parámetros:
+    -----------
+    path_clean : str o Path
+        Carpeta `clean` con una subcarpeta por año.
+    path_db : str o Path, opcional
+        Archivo de base de datos DuckDB. Por defecto, una base en memoria.
+    anios : list, opcional
+        Años a incluir. Por defecto, todos los disponibles.
+    hilos : int, opcional
+        Hilos de ejecución (por defecto, los de DuckDB: uno por CPU).
+    memoria : str, opcional
+        Límite de memoria de DuckDB (por ejemplo '4GB'); sobre él, las agregaciones usan disco.
+
+    Retorna:
+    --------
+    duckdb.DuckDBPyConnection
+    """
+    _requerir_duckdb()
+    con = duckdb.connect(str(path_db) if path_db is not None else ':memory:')
+    if hilos is not None:
+        con.execute(f"SET threads = {int(hilos)}")
+    if memoria is not None:
+        con.execute(f"SET memory_limit = {_literal(memoria)}")
+
+    for nombre_set, archivos in archivos_sets(path_clean, anios).items():
+        # UNION ALL BY NAME tolera columnas que cambian de tipo o faltan entre años
+        consulta = '\nUNION ALL BY NAME\n'.join(
+            f"SELECT *, CAST({anio} AS SMALLINT) AS anio FROM "
+            + formatos_sql[formato].format(path=str(path).replace("'", "''"))
+            for anio, path, formato in archivos
+        )
+        con.execute(f'CREATE OR REPLACE VIEW "{nombre_set}" AS {consulta}')
+
+    return con
+
+
+def _condicion_anios(anios: list) -> str:
+    """
+    Condición SQL sobre la columna 'anio' (siempre verdadera si `anios` es None).
+    """
+    if anios is None:
+        return 'TRUE'
+    return f"anio IN ({', '.join(str(int(a)) for a in anios)})" if len(anios) else 'FALSE'
+
+
+def preparar_dataset_tipo_universidad_sql(con,
+                                          tipos_universidad: list,
+                                          orden_regiones: list,
+                                          tabla: str = 'set_abcde',
+                                          anios: list = None) -> pd.DataFrame:
+    """
+    Versión SQL de `plots.preparar_dataset_tipo_universidad` (mismo esquema de salida).
+
+    Parámetros:
+    -----------
+    con : duckdb.DuckDBPyConnection
+        Conexión de `conectar`.
+    tipos_universidad : list
+        Valores de 'tipo_inst_3' a considerar.
+    orden_regiones : list
+        Orden de las regiones de sede.
+    tabla : str
+        Vista con 'cod_inst', 'region_sede' y 'tipo_inst_3'.
+    anios : list, opcional
+        Años a incluir. Por defecto, todos los de la vista.
+
+    Retorna:
+    --------
+    pd.DataFrame
+        Porcentaje de cada tipo de universidad por región de sede.
+    """
+    conteos = con.execute(f"""
+        SELECT region_sede, tipo_inst_3, count(*) AS n
+        FROM (
+            SELECT DISTINCT cod_inst, region_sede, tipo_inst_3
+            FROM "{tabla}"
+            WHERE list_contains(?, tipo_inst_3) AND {_condicion_anios(anios)}
+        )
+        WHERE list_contains(?, region_sede)
+        GROUP BY ALL
+    """, [list(tipos_universidad), list(orden_regiones)]).df()
+
+    conteos['region_sede'] = pd.Categorical(conteos['region_sede'], categories=orden_regiones, ordered=True)
+    df_grouped = conteos.set_index(['region_sede', 'tipo_inst_3'])['n'].unstack(fill_value=0)
+    df_grouped = df_grouped.sort_index().sort_index(axis=1)
+    return plots.porcentajes_tipo_universidad(df_grouped, orden_regiones)
+
+
+def preparar_dataset_tipodepen_sql(con,
+                                   regiones_dict: dict,
+                                   tipodepen_dict: dict,
+                                   index_order: list,
+                                   tabla: str = 'set_abcde',
+                                   anios: list = None) -> pd.DataFrame:
+    """
+    Versión SQL de `plots.preparar_dataset_tipodepen` (mismo esquema de salida).
+
+    `tabla` debe tener 'NOM_RBD', 'COD_REG_RB' y 'TIPO_DEPEN' (por ejemplo set_abcde o set_c).
+    """
+    conteos = con.execute(f"""
+        SELECT COD_REG_RB, TIPO_DEPEN, count(*) AS n
+        FROM (
+            SELECT DISTINCT NOM_RBD, COD_REG_RB, TIPO_DEPEN
+            FROM "{tabla}"
+            WHERE {_condicion_anios(anios)}
+        )
+        WHERE COD_REG_RB IS NOT NULL AND TIPO_DEPEN IS NOT NULL
+        GROUP BY ALL
+    """).df()
+
+    # Mismos tipos que el set limpio (ver `almacenamiento.esquema_c`)
+    conteos = conteos.astype({'COD_REG_RB': 'Int8', 'TIPO_DEPEN': 'Int8'})
+    df_grouped = conteos.set_index(['COD_REG_RB', 'TIPO_DEPEN'])['n'].unstack(fill_value=0)
+    df_grouped = df_grouped.sort_index().sort_index(axis=1)
+    return plots.porcentajes_tipodepen(df_grouped, regiones_dict, tipodepen_dict, index_order)
+
+
+def preparar_dataset_ivm_sql(con,
+                             regiones_dict: dict,
+                             index_order: list,
+                             valor_corte: float = 20.03805,
+                             tabla: str = 'set_abcde',
+                             anios: list = None) -> pd.DataFrame:
+    """
+    Versión SQL de `plots.preparar_dataset_ivm` (mismo esquema de salida).
+
+    Como `drop_duplicates(subset=['RBD'])` sobre los años concatenados, cada RBD se cuenta una vez
+    con la región e IVM de su primer año (dentro de un año ambos son constantes por RBD).
+    """
+    resultado = con.execute(f"""
+        SELECT
+            unico.fila.region AS CODIGO_REGION_EGRESO,
+            count(*) FILTER (WHERE unico.fila.ivm >= ?) AS Cumple_Condicion,
+            count(*) AS Total_Observaciones
+        FROM (
+            SELECT RBD, arg_min({{'region': CODIGO_REGION_EGRESO, 'ivm': IVM_Establecimiento}}, anio) AS fila
+            FROM "{tabla}"
+            WHERE IVM_Establecimiento IS NOT NULL AND NOT isnan(IVM_Establecimiento) AND {_condicion_anios(anios)}
+            GROUP BY RBD
+        ) AS unico
+        WHERE unico.fila.region IS NOT NULL
+        GROUP BY 1
+        ORDER BY 1
+    """, [float(valor_corte)]).df()
+
+    return plots.porcentaje_ivm_por_region(resultado, regiones_dict, index_order)
+
+
+def estadisticas_movilidad_sql(con,
+                               tabla: str = 'set_abcde',
+                               anios: list = None,
+                               col_egreso: str = 'NOMBRE_REGION_EGRESO',
+                               col_ingreso: str = 'NOMBRE_REGION_INGRESO',
+                               col_distancia: str = 'DISTANCIA') -> dict:
+    """
+    Versión SQL de `movilidad.calcular_estadisticas_movilidad`: un GROUP BY por par de regiones.
+
+    Retorna:
+    --------
+    dict
+        Mismo formato que `movilidad.calcular_estadisticas_movilidad` (regiones observadas en orden
+        alfabético y el último código para regiones faltantes).
+    """
+    distancia_valida = f'"{col_distancia}" IS NOT NULL AND NOT isnan("{col_distancia}")'
+    agregados_distancia = f"""
+        , coalesce(sum("{col_distancia}") FILTER (WHERE {distancia_valida}), 0) AS distancia_suma
+        , count(*) FILTER (WHERE {distancia_valida}) AS distancia_validas
+        , count(*) FILTER (WHERE NOT ({distancia_valida})) AS distancia_nan
+    """ if col_distancia is not None else ''
+
+    pares = con.execute(f"""
+        SELECT "{col_egreso}" AS egreso, "{col_ingreso}" AS ingreso, count(*) AS conteos {agregados_distancia}
+        FROM "{tabla}"
+        WHERE {_condicion_anios(anios)}
+        GROUP BY ALL
+    """).df()
+
+    regiones = sorted(set(pares['egreso'].dropna()) | set(pares['ingreso'].dropna()))
+    K = len(regiones)
+    codigos = pd.Index(regiones, dtype=object)
+    fila = codigos.get_indexer(pares['egreso'].astype(object))
+    columna = codigos.get_indexer(pares['ingreso'].astype(object))
+    fila[fila < 0] = K
+    columna[columna < 0] = K
+
+    estadisticas = {'regiones': regiones}
+    for nombre in pares.columns.drop(['egreso', 'ingreso']):
+        matriz = np.zeros((K + 1, K + 1), dtype=np.float64 if nombre == 'distancia_suma' else np.int64)
+        np.add.at(matriz, (fila, columna), pares[nombre].to_numpy())
+        estadisticas[nombre] = matriz
+    return estadisticas
+
+
+def preparar_matriz_movilidad_sql(con, index_order: list, tabla: str = 'set_abcde', anios: list = None) -> pd.DataFrame:
+    """
+    Versión SQL de `plots.preparar_matriz_movilidad` (mismo esquema de salida).
+    """
+    estadisticas = estadisticas_movilidad_sql(con, tabla, anios, col_distancia=None)
+    return movilidad.matriz_movilidad(estadisticas, index_order)
+
+
+def preparar_datasets_movilidad_sql(con,
+                                    index_order: list,
+                                    orden_regiones: list,
+                                    tabla: str = 'set_abcde',
+                                    anios: list = None) -> dict:
+    """
+    Versión SQL de `plots.preparar_datasets_movilidad` ('matriz', 'tasas' y 'migracion_distancia').
+
+    Requiere la columna DISTANCIA en `tabla` (set_abcde la tiene).
+    """
+    return plots.preparar_datasets_desde_estadisticas(
+        estadisticas_movilidad_sql(con, tabla, anios), index_order, orden_regiones
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Crea las vistas DuckDB sobre los conjuntos limpios.")
+    parser.add_argument('--clean', default=str(DIR_CLEAN), help="Carpeta con los conjuntos limpios por año")
+    parser.add_argument('--db', default=None, help="Archivo DuckDB donde guardar las vistas (por defecto, en memoria)")
+    parser.add_argument('--anios', nargs='+', type=int, default=None)
+    parser.add_argument('--memoria', default=None, help="Límite de memoria de DuckDB, por ejemplo 4GB")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    con = conectar(args.clean, args.db, args.anios, memoria=args.memoria)
+    for (nombre_set,) in con.execute("SELECT view_name FROM duckdb_views() WHERE NOT internal ORDER BY 1").fetchall():
+        filas, anios = con.execute(f'SELECT count(*), list(DISTINCT anio ORDER BY anio) FROM "{nombre_set}"').fetchone()
+        print(f"{nombre_set}: {filas} filas, años {anios}")
+
+    df_ivm = preparar_dataset_ivm_sql(con, plots.regiones_dict, plots.index_order, anios=args.anios)
+    print(f"Vistas listas en {time.perf_counter() - inicio:.1f} s; IVM sobre el corte por región:")
+    print(df_ivm.to_string(index=False))
@@ -0,0 +1,313 @@
+"""
+Cubo de agregados parciales para filtrar la movilidad interregional sin recorrer las filas.
+
+El cubo guarda, para cada combinación de dimensiones de filtro (año, tipo de universidad,
+dependencia, banda de puntaje y banda de IVM), las matrices región de egreso x región de ingreso
+de `movilidad.calcular_estadisticas_movilidad`. Una consulta suma las celdas seleccionadas y
+entrega la matriz, las tasas y las distancias con los mismos formatos que
+`plots.preparar_datasets_movilidad`.
+
+Uso (después de regenerar `data/clean`):
+    python code/cubo_movilidad.py --clean data/clean --anios 2021 2022 2023 2024
+"""
+import argparse
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+try:
+    from . import almacenamiento
+    from . import cache
+    from . import movilidad
+    from . import plots
+except ImportError:
+    import almacenamiento
+    import cache
+    import movilidad
+    import plots
+
+
+# Incrementar si cambian las dimensiones, las bandas o el formato del archivo
+VERSION_CUBO = 2
+
+PATH_CUBO = Path("data/plots/cubo_movilidad.npz")
+
+# Etiqueta de los valores faltantes en cada dimensión
+SIN_DATO = 'Sin dato'
+
+# Bandas de puntaje (PROM_CM_ACTUAL); 0 indica que no rindió las pruebas (ver `utils.PUNTAJE_SIN_RENDIR`)
+cortes_puntaje = [100, 450, 550, 650, 1000.5]
+etiquetas_puntaje = ['100 a 449', '450 a 549', '550 a 649', '650 a 1000']
+SIN_PUNTAJE = 'Sin puntaje'
+
+# Bandas de IVM del establecimiento de egreso; 'Sobre el corte' usa el valor de corte de cada año
+# (columna 'valor_corte' de `utils.leer_conjunto_e`), no un corte fijo
+cortes_ivm = [0, 10, 15]
+etiquetas_ivm = ['0 a 10', '10 a 15', '15 al corte', 'Sobre el corte']
+
+# Dimensiones de filtro del cubo, en orden de los ejes
+dimensiones_cubo = ['anio', 'tipo_inst_3', 'TIPO_DEPEN', 'BANDA_PUNTAJE', 'BANDA_IVM']
+
+# Columnas de set_abcde necesarias para construir el cubo
+columnas_cubo = [
+    'NOMBRE_REGION_EGRESO', 'NOMBRE_REGION_INGRESO', 'DISTANCIA',
+    'tipo_inst_3', 'TIPO_DEPEN', 'PROM_CM_ACTUAL', 'IVM_Establecimiento', 'valor_corte',
+]
+
+
+def agregar_bandas(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Agrega las columnas categóricas 'BANDA_PUNTAJE' y 'BANDA_IVM' a partir de PROM_CM_ACTUAL e IVM.
+
+    'Sobre el corte' compara el IVM con el 'valor_corte' de cada fila, que cambia entre años.
+    Los puntajes 0 quedan en `SIN_PUNTAJE`; los faltantes o fuera de rango, en `SIN_DATO`.
+    """
+    puntaje = pd.to_numeric(df['PROM_CM_ACTUAL'], errors='coerce')
+    banda_puntaje = pd.cut(puntaje, cortes_puntaje, labels=etiquetas_puntaje, right=False)
+    banda_puntaje = banda_puntaje.cat.add_categories([SIN_PUNTAJE, SIN_DATO])
+    banda_puntaje[puntaje == 0] = SIN_PUNTAJE
+    banda_puntaje = banda_puntaje.fillna(SIN_DATO)
+
+    ivm = pd.to_numeric(df['IVM_Establecimiento'], errors='coerce').to_numpy(dtype=np.float64)
+    valor_corte = pd.to_numeric(df['valor_corte'], errors='coerce').to_numpy(dtype=np.float64)
+    codigos = np.searchsorted(cortes_ivm, ivm, side='right') - 1
+    codigos[ivm >= valor_corte] = len(etiquetas_ivm) - 1
+    # Sin IVM o sin valor de corte del año no se puede asignar la banda
+    codigos[np.isnan(ivm) | (ivm < cortes_ivm[0]) | np.isnan(valor_corte)] = len(etiquetas_ivm)
+    banda_ivm = pd.Categorical.from_codes(codigos, categories=etiquetas_ivm + [SIN_DATO])
+
+    return df.assign(BANDA_PUNTAJE=banda_puntaje, BANDA_IVM=pd.Series(banda_ivm, index=df.index))
+
+
+def _codificar_dimension(serie: pd.Series) -> tuple:
+    """
+    Códigos enteros de una dimensión y sus etiquetas; los faltantes son una etiqueta más (`SIN_DATO`).
+    """
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        valores = list(serie.cat.categories)
+        codigos = serie.cat.codes.to_numpy().astype(np.int64)
+    else:
+        codigos, valores = pd.factorize(serie, sort=True)
+        valores = list(valores)
+
+    faltantes = codigos < 0
+    if faltantes.any() and SIN_DATO not in valores:
+        codigos = np.where(faltantes, len(valores), codigos)
+        valores.append(SIN_DATO)
+    elif faltantes.any():
+        codigos = np.where(faltantes, valores.index(SIN_DATO), codigos)
+
+    # Escalares de Python (los años y TIPO_DEPEN se guardan como JSON)
+    valores = [v.item() if isinstance(v, np.generic) else v for v in valores]
+    return codigos, valores
+
+
+class CuboMovilidad:
+    """
+    Agregados de movilidad por combinación de dimensiones de filtro.
+
+    Cada arreglo tiene forma `(n_1, ..., n_d, K+1, K+1)`: un eje por dimensión (con tantos valores
+    como etiquetas en `valores`) y la matriz de egreso x ingreso de `movilidad.calcular_estadisticas_movilidad`,
+    con el último código reservado para regiones faltantes. Con cuatro años, 16 regiones y las
+    bandas por defecto el cubo tiene del orden de un millón de celdas, y una consulta es una suma
+    sobre los ejes filtrados.
+
+    Parámetros:
+    -----------
+    regiones : list
+        Regiones de la matriz (K).
+    valores : dict
+        Dimensión -> lista de etiquetas, en el orden de los ejes.
+    arreglos : dict
+        'conteos', 'distancia_suma', 'distancia_validas' y 'distancia_nan' (ver `desde_dataframe`).
+    """
+
+    def __init__(self, regiones: list, valores: dict, arreglos: dict):
+        self.regiones = list(regiones)
+        self.valores = {dimension: list(etiquetas) for dimension, etiquetas in valores.items()}
+        self.arreglos = arreglos
+
+    @property
+    def dimensiones(self) -> list:
+        return list(self.valores)
+
+    @classmethod
+    def desde_dataframe(cls, df: pd.DataFrame, dimensiones: list = None):
+        """
+        Construye el cubo con una sola pasada de `np.bincount` sobre `df`.
+
+        Parámetros:
+        -----------
+        df : pd.DataFrame
+            Set ABCDE (uno o varios años) con las columnas de `columnas_cubo`; la columna 'anio' es opcional.
+        dimensiones : list, opcional
+            Dimensiones de filtro. Por defecto, las de `dimensiones_cubo` presentes en `df`
+            (las bandas se calculan con `agregar_bandas`).
+
+        Retorna:
+        --------
+        CuboMovilidad
+        """
+        if 'BANDA_PUNTAJE' not in df.columns or 'BANDA_IVM' not in df.columns:
+            df = agregar_bandas(df)
+        if dimensiones is None:
+            dimensiones = [d for d in dimensiones_cubo if d in df.columns]
+
+        regiones, celda = movilidad.celdas_movilidad(df)
+        n_celdas = (len(regiones) + 1) ** 2
+
+        # Índice plano: grupo de dimensiones * celdas + celda de la matriz
+        valores = {}
+        grupo = np.zeros(len(df), dtype=np.int64)
+        for dimension in dimensiones:
+            codigos, valores[dimension] = _codificar_dimension(df[dimension])
+            grupo = grupo * len(valores[dimension]) + codigos
+
+        forma = tuple(len(v) for v in valores.values()) + (len(regiones) + 1, len(regiones) + 1)
+        distancia = df['DISTANCIA'] if 'DISTANCIA' in df.columns else None
+        acumulados = movilidad.acumular_por_celda(grupo * n_celdas + celda, int(np.prod(forma)), distancia)
+
+        arreglos = {
+            nombre: arreglo.reshape(forma).astype(np.float64 if nombre == 'distancia_suma' else np.int32)
+            for nombre, arreglo in acumulados.items()
+        }
+        return cls(regiones, valores, arreglos)
+
+    def _indices(self, filtros: dict) -> list:
+        """
+        Posiciones seleccionadas en cada eje (None si no se filtra esa dimensión).
+        """
+        desconocidas = set(filtros) - set(self.valores)
+        if desconocidas:
+            raise ValueError(f"Dimensiones no disponibles: {sorted(desconocidas)}. Opciones: {self.dimensiones}")
+
+        indices = []
+        for dimension, etiquetas in self.valores.items():
+            seleccion = filtros.get(dimension)
+            if seleccion is None:
+                indices.append(None)
+                continue
+            if isinstance(seleccion, (str, int, np.integer)):
+                seleccion = [seleccion]
+            posiciones = [etiquetas.index(v) for v in seleccion if v in etiquetas]
+            indices.append(np.array(posiciones, dtype=np.int64))
+        return indices
+
+    def estadisticas(self, **filtros) -> dict:
+        """
+        Estadísticas de movilidad del subconjunto que cumple los filtros.
+
+        Parámetros:
+        -----------
+        **filtros
+            Dimensión -> valor o lista de valores a conservar (por ejemplo `anio=[2021, 2022]`,
+            `TIPO_DEPEN=3`). Las dimensiones omitidas (o con None) no se filtran.
+
+        Retorna:
+        --------
+        dict
+            Mismo formato que `movilidad.calcular_estadisticas_movilidad`.
+        """
+        indices = self._indices(filtros)
+        ejes = tuple(range(len(indices)))
+
+        estadisticas = {'regiones': self.regiones}
+        for nombre, arreglo in self.arreglos.items():
+            for eje, posiciones in enumerate(indices):
+                if posiciones is not None:
+                    arreglo = arreglo.take(posiciones, axis=eje)
+            estadisticas[nombre] = arreglo.sum(axis=ejes, dtype=np.float64 if nombre == 'distancia_suma' else np.int64)
+        return estadisticas
+
+    def datasets(self, index_order: list = None, orden_regiones: list = None, **filtros) -> dict:
+        """
+        Matriz, tasas y distancias promedio del subconjunto filtrado.
+
+        Equivale a filtrar las filas y llamar a `plots.preparar_datasets_movilidad`.
+
+        Retorna:
+        --------
+        dict
+            'matriz', 'tasas' y 'migracion_distancia'.
+        """
+        return plots.preparar_datasets_desde_estadisticas(
+            self.estadisticas(**filtros),
+            plots.index_order_02 if index_order is None else index_order,
+            plots.orden_regiones if orden_regiones is None else orden_regiones,
+        )
+
+    def guardar(self, path=PATH_CUBO) -> Path:
+        """
+        Guarda el cubo en un archivo `.npz` comprimido, con regiones y etiquetas como metadatos JSON.
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        metadatos = {'version': VERSION_CUBO, 'regiones': self.regiones, 'valores': self.valores}
+
+        path_tmp = path.with_suffix('.tmp.npz')
+        np.savez_compressed(path_tmp, metadatos=np.array(json.dumps(metadatos, ensure_ascii=False)), **self.arreglos)
+        path_tmp.replace(path)
+        return path
+
+    @classmethod
+    def cargar(cls, path=PATH_CUBO):
+        """
+        Lee un cubo guardado con `guardar`; retorna None si no existe o es de otra versión.
+        """
+        path = Path(path)
+        if not path.exists():
+            return None
+        with np.load(path) as archivo:
+            metadatos = json.loads(archivo['metadatos'].item())
+            if metadatos.get('version') != VERSION_CUBO:
+                return None
+            arreglos = {nombre: archivo[nombre] for nombre in archivo.files if nombre != 'metadatos'}
+        return cls(metadatos['regiones'], metadatos['valores'], arreglos)
+
+
+def leer_set_abcde(path_clean, anios: list, formato: str = 'csv') -> pd.DataFrame:
+    """
+    Lee las columnas de `columnas_cubo` del set ABCDE de varios años, con una columna 'anio'.
+    """
+    if formato == 'parquet':
+        return almacenamiento.leer_set_parquet(path_clean, 'set_abcde', anios=anios, columnas=columnas_cubo)
+
+    frames = []
+    for anio in anios:
+        path = Path(path_clean) / str(anio) / "set_abcde.csv"
+        if not path.exists():
+            continue
+        df = almacenamiento.aplicar_esquema(pd.read_csv(path, usecols=columnas_cubo), 'set_abcde')
+        frames.append(df.assign(anio=np.int16(anio)))
+
+    if not frames:
+        raise FileNotFoundError(f"No se encontró set_abcde.csv en {path_clean} para los años {anios}")
+    return pd.concat(frames, ignore_index=True)
+
+
+def huella_cubo(path=PATH_CUBO) -> str:
+    """
+    Huella (tamaño y fecha de modificación) del archivo del cubo, o '' si no existe.
+    """
+    path = Path(path)
+    return cache.huella_mtime([path]) if path.exists() else ''
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Construye el cubo de movilidad filtrable para la aplicación.")
+    parser.add_argument('--clean', default='data/clean', help="Carpeta con los conjuntos limpios por año")
+    parser.add_argument('--anios', nargs='+', type=int, default=[2021, 2022, 2023, 2024])
+    parser.add_argument('--formato', choices=['csv', 'parquet'], default='csv')
+    parser.add_argument('--salida', default=str(PATH_CUBO))
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    df = leer_set_abcde(args.clean, args.anios, args.formato)
+    cubo = CuboMovilidad.desde_dataframe(df)
+    path = cubo.guardar(args.salida)
+    forma = cubo.arreglos['conteos'].shape
+    print(f"Cubo de {len(df)} filas ({' x '.join(map(str, forma))} celdas) guardado en {path} "
+          f"en {time.perf_counter() - inicio:.1f} s")
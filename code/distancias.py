@@ -0,0 +1,148 @@
+import numpy as np
+import pandas as pd
+
+
+# Constantes geodésicas
+R = 6371.0  # Radio medio de la Tierra en km
+WGS84_A = 6378137.0  # Semieje mayor en metros
+WGS84_F = 1 / 298.257223563  # Achatamiento
+WGS84_B = (1 - WGS84_F) * WGS84_A  # Semieje menor en metros
+
+
+def _como_arreglo(valores) -> np.ndarray:
+    """
+    Convierte una columna o escalar en un arreglo float64, transformando NA en NaN.
+    """
+    if isinstance(valores, (pd.Series, pd.Index)):
+        return valores.to_numpy(dtype='float64', na_value=np.nan)
+    return np.asarray(valores, dtype='float64')
+
+
+def haversine_vectorizado(lat1, lon1, lat2, lon2, radio: float = R) -> np.ndarray:
+    """
+    Calcula la distancia Haversine (en km) entre arreglos de coordenadas.
+
+    Parámetros:
+    -----------
+    lat1, lon1 : array-like
+        Latitudes y longitudes de origen, en grados.
+    lat2, lon2 : array-like
+        Latitudes y longitudes de destino, en grados.
+    radio : float
+        Radio de la esfera en km.
+
+    Retorna:
+    --------
+    np.ndarray
+        Distancias en km. Si alguna coordenada es NaN, la distancia es NaN.
+    """
+    lat1, lon1, lat2, lon2 = (np.radians(_como_arreglo(x)) for x in (lat1, lon1, lat2, lon2))
+
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    a = np.clip(a, 0.0, 1.0)  # Evita errores de redondeo fuera del dominio de sqrt
+
+    return radio * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def vincenty_vectorizado(lat1, lon1, lat2, lon2, max_iter: int = 200, tol: float = 1e-12) -> np.ndarray:
+    """
+    Calcula la distancia geodésica (en km) sobre el elipsoide WGS84 usando la fórmula inversa de Vincenty.
+
+    Parámetros:
+    -----------
+    lat1, lon1 : array-like
+        Latitudes y longitudes de origen, en grados.
+    lat2, lon2 : array-like
+        Latitudes y longitudes de destino, en grados.
+    max_iter : int
+        Número máximo de iteraciones.
+    tol : float
+        Tolerancia de convergencia para la longitud auxiliar (radianes).
+
+    Retorna:
+    --------
+    np.ndarray
+        Distancias en km. Es NaN si alguna coordenada es NaN o si el método no converge
+        (puntos casi antipodales, que no ocurren dentro de Chile).
+    """
+    lat1, lon1, lat2, lon2 = np.broadcast_arrays(*(_como_arreglo(x) for x in (lat1, lon1, lat2, lon2)))
+
+    L = np.radians(lon2 - lon1)
+    U1 = np.arctan((1 - WGS84_F) * np.tan(np.radians(lat1)))
+    U2 = np.arctan((1 - WGS84_F) * np.tan(np.radians(lat2)))
+    sin_u1, cos_u1 = np.sin(U1), np.cos(U1)
+    sin_u2, cos_u2 = np.sin(U2), np.cos(U2)
+
+    lam = L.copy()
+    delta = np.full(lam.shape, np.inf)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        for _ in range(max_iter):
+            sin_lam, cos_lam = np.sin(lam), np.cos(lam)
+            sin_sigma = np.sqrt((cos_u2 * sin_lam) ** 2 + (cos_u1 * sin_u2 - sin_u1 * cos_u2 * cos_lam) ** 2)
+            cos_sigma = sin_u1 * sin_u2 + cos_u1 * cos_u2 * cos_lam
+            sigma = np.arctan2(sin_sigma, cos_sigma)
+
+            sin_alpha = np.where(sin_sigma == 0, 0.0, cos_u1 * cos_u2 * sin_lam / sin_sigma)
+            cos2_alpha = 1 - sin_alpha ** 2
+            cos_2sigma_m = np.where(cos2_alpha == 0, 0.0, cos_sigma - 2 * sin_u1 * sin_u2 / cos2_alpha)
+
+            C = WGS84_F / 16 * cos2_alpha * (4 + WGS84_F * (4 - 3 * cos2_alpha))
+            lam_anterior = lam
+            lam = L + (1 - C) * WGS84_F * sin_alpha * (
+                sigma + C * sin_sigma * (cos_2sigma_m + C * cos_sigma * (-1 + 2 * cos_2sigma_m ** 2))
+            )
+
+            delta = np.abs(lam - lam_anterior)
+            if np.all((delta < tol) | np.isnan(delta)):
+                break
+
+        u2 = cos2_alpha * (WGS84_A ** 2 - WGS84_B ** 2) / WGS84_B ** 2
+        A = 1 + u2 / 16384 * (4096 + u2 * (-768 + u2 * (320 - 175 * u2)))
+        B = u2 / 1024 * (256 + u2 * (-128 + u2 * (74 - 47 * u2)))
+        delta_sigma = B * sin_sigma * (
+            cos_2sigma_m + B / 4 * (
+                cos_sigma * (-1 + 2 * cos_2sigma_m ** 2)
+                - B / 6 * cos_2sigma_m * (-3 + 4 * sin_sigma ** 2) * (-3 + 4 * cos_2sigma_m ** 2)
+            )
+        )
+        s = WGS84_B * A * (sigma - delta_sigma)
+
+    return np.where(delta < tol, s / 1000.0, np.nan)
+
+
+METODOS_DISTANCIA = {
+    'haversine': haversine_vectorizado,
+    'vincenty': vincenty_vectorizado,
+}
+
+
+def calcular_distancia_columnas(df: pd.DataFrame,
+                                lat1: str = 'LATITUD_COL',
+                                lon1: str = 'LONGITUD_COL',
+                                lat2: str = 'LATITUD_UNI',
+                                lon2: str = 'LONGITUD_UNI',
+                                metodo: str = 'haversine') -> np.ndarray:
+    """
+    Calcula la distancia entre dos pares de columnas de coordenadas de un DataFrame.
+
+    Parámetros:
+    -----------
+    df : pd.DataFrame
+        DataFrame con las columnas de coordenadas.
+    lat1, lon1, lat2, lon2 : str
+        Nombres de las columnas de origen (establecimiento) y destino (sede).
+    metodo : str
+        'haversine' (esfera) o 'vincenty' (elipsoide WGS84).
+
+    Retorna:
+    --------
+    np.ndarray
+        Distancias en km, alineadas con las filas de `df`.
+    """
+    if metodo not in METODOS_DISTANCIA:
+        raise ValueError(f"Método de distancia desconocido: {metodo!r}. Opciones: {list(METODOS_DISTANCIA)}")
+
+    return METODOS_DISTANCIA[metodo](df[lat1], df[lon1], df[lat2], df[lon2])
@@ -0,0 +1,177 @@
+from difflib import SequenceMatcher
+
+import numpy as np
+import pandas as pd
+
+try:
+    from . import regiones
+    from . import uniones
+except ImportError:
+    import regiones
+    import uniones
+
+
+# Claves de sede en el set A (matrícula) y en el set D (inmuebles), en el mismo orden
+claves_sede_a = ['nomb_inst', 'NOMBRE_REGION_INGRESO', 'comuna_sede']
+claves_sede_d = ['NOMBRE_INS', 'REGIÓN', 'COMUNA']
+
+# Palabras que no distinguen instituciones entre sí
+palabras_vacias = {'DE', 'DEL', 'LA', 'LAS', 'LOS', 'EL', 'Y', 'EN'}
+
+# Puntaje mínimo (0 a 1) para aceptar un emparejamiento difuso
+UMBRAL_EMPAREJAMIENTO = 0.88
+
+
+def normalizar_nombre(nombre) -> str:
+    """
+    Normaliza un nombre de institución: sin tildes, mayúsculas, sin puntuación ni palabras vacías,
+    con las palabras ordenadas (el orden no afecta la comparación).
+    """
+    if pd.isna(nombre):
+        return ''
+    palabras = [p for p in regiones.normalizar_texto(nombre).split() if p not in palabras_vacias]
+    return ' '.join(sorted(palabras))
+
+
+def puntaje_similitud(a: str, b: str) -> float:
+    """
+    Similitud entre dos nombres normalizados (0 a 1): el máximo entre la razón de caracteres
+    de `difflib` y la proporción de palabras compartidas.
+    """
+    if not a or not b:
+        return 0.0
+    palabras_a, palabras_b = set(a.split()), set(b.split())
+    jaccard = len(palabras_a & palabras_b) / len(palabras_a | palabras_b)
+    return max(SequenceMatcher(None, a, b).ratio(), jaccard)
+
+
+def construir_crosswalk(set_a: pd.DataFrame,
+                        set_d: pd.DataFrame,
+                        umbral: float = UMBRAL_EMPAREJAMIENTO) -> pd.DataFrame:
+    """
+    Empareja las sedes distintas del set A con las sedes del set D y retorna la tabla de equivalencias.
+
+    Se trabaja sobre las combinaciones distintas de (`nomb_inst`, región, comuna), no sobre estudiantes.
+    Cada clave se resuelve en el primer nivel que la empareja:
+
+    1. 'exacto': igualdad de las tres columnas (mismo criterio que el merge original).
+    2. 'normalizado': igualdad tras quitar tildes, mayúsculas, puntuación y palabras vacías.
+    3. 'difuso': mejor candidato con `puntaje_similitud` >= `umbral`, comparando solo contra sedes
+       de la misma región y comuna (bloqueo), de modo que cada clave tiene pocos candidatos.
+
+    Parámetros:
+    -----------
+    set_a : pd.DataFrame
+        Set A (o cualquier conjunto derivado) con las columnas de `claves_sede_a`.
+    set_d : pd.DataFrame
+        Set D con las columnas de `claves_sede_d`.
+    umbral : float
+        Puntaje mínimo para aceptar un emparejamiento difuso.
+
+    Retorna:
+    --------
+    pd.DataFrame
+        Una fila por clave del set A con 'ID_SEDE' (posición en `set_d`, -1 sin emparejar), las claves
+        del set D emparejado, 'PUNTAJE' y 'TIPO_EMPAREJAMIENTO'.
+    """
+    claves = set_a[claves_sede_a].drop_duplicates().reset_index(drop=True)
+    sedes = set_d[claves_sede_d].reset_index(drop=True)
+    sedes['ID_SEDE'] = np.arange(len(sedes))
+
+    # 1. Exacto (un merge sobre claves distintas; set D no tiene claves repetidas)
+    exactos = claves.merge(sedes, left_on=claves_sede_a, right_on=claves_sede_d, how='left')
+    id_sede = exactos['ID_SEDE'].fillna(-1).to_numpy(dtype=np.int64)
+    puntaje = np.where(id_sede >= 0, 1.0, np.nan)
+    tipo = np.where(id_sede >= 0, 'exacto', None).astype(object)
+
+    # Claves normalizadas de ambos lados (una vez por valor distinto)
+    nombre_a = claves['nomb_inst'].map(normalizar_nombre).to_numpy(dtype=object)
+    region_a = claves['NOMBRE_REGION_INGRESO'].astype(object).to_numpy()
+    comuna_a = claves['comuna_sede'].map(normalizar_nombre).to_numpy(dtype=object)
+    nombre_d = sedes['NOMBRE_INS'].map(normalizar_nombre).to_numpy(dtype=object)
+    region_d = sedes['REGIÓN'].astype(object).to_numpy()
+    comuna_d = sedes['COMUNA'].map(normalizar_nombre).to_numpy(dtype=object)
+
+    bloques = {}
+    for i, bloque in enumerate(zip(region_d, comuna_d)):
+        bloques.setdefault(bloque, []).append(i)
+
+    for i in np.flatnonzero(id_sede < 0):
+        if not nombre_a[i]:
+            continue
+        candidatos = bloques.get((region_a[i], comuna_a[i]), [])
+        if not candidatos:
+            continue
+
+        # 2. Normalizado
+        iguales = [j for j in candidatos if nombre_d[j] == nombre_a[i]]
+        if iguales:
+            id_sede[i], puntaje[i], tipo[i] = iguales[0], 1.0, 'normalizado'
+            continue
+
+        # 3. Difuso dentro del bloque
+        puntajes = [puntaje_similitud(nombre_a[i], nombre_d[j]) for j in candidatos]
+        mejor = int(np.argmax(puntajes))
+        if puntajes[mejor] >= umbral:
+            id_sede[i], puntaje[i], tipo[i] = candidatos[mejor], puntajes[mejor], 'difuso'
+        else:
+            puntaje[i] = puntajes[mejor]
+
+    crosswalk = claves.copy()
+    crosswalk['ID_SEDE'] = id_sede
+    emparejadas = sedes.drop(columns='ID_SEDE').reindex(np.where(id_sede >= 0, id_sede, -1))
+    for columna in claves_sede_d:
+        crosswalk[columna] = emparejadas[columna].astype(object).to_numpy()
+    crosswalk['PUNTAJE'] = puntaje
+    crosswalk['TIPO_EMPAREJAMIENTO'] = tipo
+
+    conteo = crosswalk['TIPO_EMPAREJAMIENTO'].value_counts()
+    print(
+        f"Crosswalk de sedes: {len(crosswalk)} claves, "
+        + ', '.join(f"{t}: {conteo.get(t, 0)}" for t in ['exacto', 'normalizado', 'difuso'])
+        + f", sin emparejar: {(id_sede < 0).sum()}"
+    )
+    return crosswalk
+
+
+def unir_con_crosswalk(df: pd.DataFrame,
+                       set_d: pd.DataFrame,
+                       crosswalk: pd.DataFrame,
+                       nombre: str = None,
+                       diagnosticos: list = None) -> pd.DataFrame:
+    """
+    Agrega a `df` las columnas del set D según el crosswalk (equivale al merge left por claves de sede).
+
+    Parámetros:
+    -----------
+    df : pd.DataFrame
+        Conjunto con las columnas de `claves_sede_a` (por ejemplo ABC).
+    set_d : pd.DataFrame
+        Set D usado para construir el crosswalk (mismo orden de filas).
+    crosswalk : pd.DataFrame
+        Resultado de `construir_crosswalk`.
+    nombre : str, opcional
+        Nombre de la unión en el diagnóstico.
+    diagnosticos : list, opcional
+        Lista a la que se agrega el diagnóstico de la unión (ver `uniones.diagnostico_union`).
+
+    Retorna:
+    --------
+    pd.DataFrame
+        `df` con las columnas de `set_d` a la derecha (NaN en las filas sin emparejar).
+    """
+    id_sede = df[claves_sede_a].merge(
+        crosswalk[claves_sede_a + ['ID_SEDE']], on=claves_sede_a, how='left'
+    )['ID_SEDE'].fillna(-1).to_numpy(dtype=np.int64)
+
+    sedes = set_d.reset_index(drop=True).reindex(id_sede)
+    resultado = pd.concat([df.reset_index(drop=True), sedes.reset_index(drop=True)], axis=1)
+
+    if diagnosticos is not None:
+        # Claves compuestas codificadas como enteros (solo se cuentan, no se comparan entre lados)
+        claves_df = pd.factorize(pd.MultiIndex.from_frame(df[claves_sede_a].astype(object)))[0]
+        claves_d = pd.factorize(pd.MultiIndex.from_frame(set_d[claves_sede_d].astype(object)))[0]
+        diagnosticos.append(uniones.diagnostico_union(nombre or 'crosswalk', claves_df.astype('float64'),
+                                                      claves_d.astype('float64'), id_sede, len(resultado)))
+
+    return resultado
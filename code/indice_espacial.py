@@ -0,0 +1,162 @@
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import BallTree
+
+try:
+    from . import distancias
+except ImportError:
+    import distancias
+
+
+class IndiceSedes:
+    """
+    Índice espacial (BallTree con métrica haversine) sobre las coordenadas de las sedes del set D.
+
+    Permite consultar en bloque, para miles de establecimientos a la vez, las k sedes más
+    cercanas o las sedes dentro de un radio. Las distancias se retornan en km.
+
+    Parámetros:
+    -----------
+    set_d : pd.DataFrame
+        Sedes con columnas de latitud y longitud (las filas sin coordenadas se omiten).
+    col_lat, col_lon : str
+        Columnas de coordenadas en grados.
+    radio : float
+        Radio de la Tierra en km (el mismo de `distancias.haversine_vectorizado`).
+    """
+
+    def __init__(self, set_d: pd.DataFrame, col_lat: str = 'LATITUD_UNI', col_lon: str = 'LONGITUD_UNI',
+                 radio: float = distancias.R):
+        coordenadas = set_d[[col_lat, col_lon]].apply(pd.to_numeric, errors='coerce')
+        validas = coordenadas.notna().all(axis=1).to_numpy()
+
+        self.sedes = set_d[validas].reset_index(drop=True)
+        self.radio = radio
+        self._arbol = BallTree(np.radians(coordenadas[validas].to_numpy(dtype='float64')), metric='haversine')
+
+    def __len__(self) -> int:
+        return len(self.sedes)
+
+    @staticmethod
+    def _puntos(lat, lon) -> tuple:
+        """
+        Convierte las coordenadas de consulta a radianes y marca las filas sin coordenadas.
+        """
+        puntos = np.column_stack([distancias._como_arreglo(lat), distancias._como_arreglo(lon)])
+        validos = ~np.isnan(puntos).any(axis=1)
+        return np.radians(puntos[validos]), validos
+
+    def vecinos_mas_cercanos(self, lat, lon, k: int = 1) -> tuple:
+        """
+        Busca las `k` sedes más cercanas a cada punto.
+
+        Parámetros:
+        -----------
+        lat, lon : array-like
+            Coordenadas de consulta en grados.
+        k : int
+            Cantidad de vecinos por punto.
+
+        Retorna:
+        --------
+        tuple
+            (distancias en km, posiciones en `self.sedes`), ambos de forma (n, k) y ordenados de menor
+            a mayor distancia. Los puntos sin coordenadas quedan con NaN y -1.
+        """
+        puntos, validos = self._puntos(lat, lon)
+        k = min(k, len(self))
+
+        distancia_km = np.full((len(validos), k), np.nan)
+        posiciones = np.full((len(validos), k), -1, dtype=np.int64)
+        if len(puntos) and k:
+            d, i = self._arbol.query(puntos, k=k)
+            distancia_km[validos] = d * self.radio
+            posiciones[validos] = i
+
+        return distancia_km, posiciones
+
+    def contar_en_radio(self, lat, lon, radio_km: float) -> np.ndarray:
+        """
+        Cuenta las sedes a `radio_km` o menos de cada punto (0 para puntos sin coordenadas).
+        """
+        puntos, validos = self._puntos(lat, lon)
+
+        conteo = np.zeros(len(validos), dtype=np.int64)
+        if len(puntos):
+            conteo[validos] = self._arbol.query_radius(puntos, r=radio_km / self.radio, count_only=True)
+
+        return conteo
+
+    def sedes_en_radio(self, lat, lon, radio_km: float) -> list:
+        """
+        Posiciones en `self.sedes` y distancias (km) de las sedes a `radio_km` o menos de cada punto.
+
+        Retorna:
+        --------
+        list
+            Una tupla (posiciones, distancias en km) por punto, ordenadas por distancia.
+        """
+        puntos, validos = self._puntos(lat, lon)
+
+        resultado = [(np.empty(0, dtype=np.int64), np.empty(0))] * len(validos)
+        if len(puntos):
+            posiciones, d = self._arbol.query_radius(puntos, r=radio_km / self.radio,
+                                                      return_distance=True, sort_results=True)
+            for fila, pos, dist in zip(np.flatnonzero(validos), posiciones, d):
+                resultado[fila] = (pos, dist * self.radio)
+
+        return resultado
+
+
+def agregar_sedes_cercanas(df: pd.DataFrame,
+                           set_d: pd.DataFrame,
+                           radios_km: list = (10, 50),
+                           col_lat: str = 'LATITUD_COL',
+                           col_lon: str = 'LONGITUD_COL',
+                           indice: IndiceSedes = None) -> pd.DataFrame:
+    """
+    Agrega a cada establecimiento la sede de educación superior más cercana y las sedes en cada radio.
+
+    Las consultas se hacen una sola vez por par de coordenadas distinto, por lo que sirve tanto para
+    el set C (un establecimiento por fila) como para ABCDE (un estudiante por fila).
+
+    Columnas nuevas: 'NOMBRE_SEDE_CERCANA', 'DISTANCIA_SEDE_CERCANA' (km) y 'SEDES_<r>KM' por radio.
+
+    Parámetros:
+    -----------
+    df : pd.DataFrame
+        Establecimientos con coordenadas.
+    set_d : pd.DataFrame
+        Sedes con 'NOMBRE_INS', 'LATITUD_UNI' y 'LONGITUD_UNI'.
+    radios_km : list
+        Radios (km) para contar sedes cercanas.
+    col_lat, col_lon : str
+        Columnas de coordenadas del establecimiento.
+    indice : IndiceSedes, opcional
+        Índice ya construido sobre `set_d` (para reutilizarlo entre años).
+
+    Retorna:
+    --------
+    pd.DataFrame
+        Copia de `df` con las columnas nuevas.
+    """
+    indice = indice if indice is not None else IndiceSedes(set_d)
+
+    coordenadas = df[[col_lat, col_lon]].apply(pd.to_numeric, errors='coerce')
+    codigos, unicos = pd.factorize(pd.MultiIndex.from_frame(coordenadas))
+    lat_unicas = unicos.get_level_values(0).to_numpy(dtype='float64')
+    lon_unicas = unicos.get_level_values(1).to_numpy(dtype='float64')
+
+    distancia_km, posiciones = indice.vecinos_mas_cercanos(lat_unicas, lon_unicas, k=1)
+    nombres = indice.sedes['NOMBRE_INS'].astype(object).to_numpy()
+    nombre_cercana = np.where(posiciones[:, 0] >= 0, nombres[posiciones[:, 0]], None)
+
+    # Las filas sin coordenadas (código -1) toman el último elemento agregado como faltante
+    resultado = df.copy()
+    resultado['NOMBRE_SEDE_CERCANA'] = np.append(nombre_cercana, None)[codigos]
+    resultado['DISTANCIA_SEDE_CERCANA'] = np.append(distancia_km[:, 0], np.nan)[codigos]
+    for radio_km in radios_km:
+        conteo = indice.contar_en_radio(lat_unicas, lon_unicas, radio_km)
+        resultado[f'SEDES_{radio_km:g}KM'] = np.append(conteo, 0)[codigos]
+
+    return resultado
@@ -0,0 +1,216 @@
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+try:
+    from . import cache
+    from . import distancias
+except ImportError:
+    import cache
+    import distancias
+
+
+# Filas de la matriz calculadas por bloque (acota la memoria temporal del cálculo)
+FILAS_POR_BLOQUE = 1024
+
+# Incrementar si cambia el formato de la matriz (invalida las matrices guardadas)
+VERSION_MATRIZ = 2
+
+
+class MatrizDistancias:
+    """
+    Distancias (km) entre cada establecimiento (RBD del set C) y cada ubicación de sede del set D.
+
+    La matriz se guarda en disco como `.npy` float64 (los mismos valores que el cálculo directo) y
+    se abre como memoria mapeada, de modo que varios años o análisis de sensibilidad la reutilizan
+    sin recalcular ni cargarla completa.
+    Las columnas son los pares de coordenadas distintos del set D (varias sedes pueden compartirlos).
+
+    Parámetros:
+    -----------
+    directorio : str o Path
+        Carpeta con 'distancias.npy', 'rbd.npy', 'coordenadas_rbd.npy', 'coordenadas_sedes.npy'
+        y 'metadatos.json' (ver `construir_matriz_distancias`).
+    """
+
+    def __init__(self, directorio):
+        self.directorio = Path(directorio)
+        with open(self.directorio / 'metadatos.json', encoding='utf-8') as f:
+            self.metadatos = json.load(f)
+
+        self.distancias = np.load(self.directorio / 'distancias.npy', mmap_mode='r')
+        self.rbd = np.load(self.directorio / 'rbd.npy')
+        self.coordenadas_rbd = np.load(self.directorio / 'coordenadas_rbd.npy')
+        self.coordenadas_sedes = np.load(self.directorio / 'coordenadas_sedes.npy')
+        # Cada sede se indexa por sus coordenadas como número complejo (latitud + i·longitud)
+        self._columnas = pd.Index(self.coordenadas_sedes[:, 0] + 1j * self.coordenadas_sedes[:, 1])
+
+    @property
+    def forma(self) -> tuple:
+        return self.distancias.shape
+
+    def distancias_filas(self,
+                         df: pd.DataFrame,
+                         col_rbd: str = 'RBD',
+                         lat_col: str = 'LATITUD_COL',
+                         lon_col: str = 'LONGITUD_COL',
+                         lat_uni: str = 'LATITUD_UNI',
+                         lon_uni: str = 'LONGITUD_UNI') -> np.ndarray:
+        """
+        Distancia de cada fila de `df` obtenida por índice desde la matriz.
+
+        La fila de la matriz se busca por RBD y la columna por las coordenadas exactas de la sede.
+        Las filas cuyo RBD no está en la matriz, cuyas coordenadas de establecimiento no coinciden
+        con las guardadas o cuya sede no está en el set D se calculan directamente.
+
+        Retorna:
+        --------
+        np.ndarray
+            Distancias en km (float64), NaN donde faltan coordenadas.
+        """
+        rbd = pd.to_numeric(df[col_rbd], errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+        lat_c = distancias._como_arreglo(df[lat_col])
+        lon_c = distancias._como_arreglo(df[lon_col])
+        lat_u = distancias._como_arreglo(df[lat_uni])
+        lon_u = distancias._como_arreglo(df[lon_uni])
+
+        # Las búsquedas se hacen sobre los valores distintos y se propagan a las filas por código
+        codigos_rbd, rbd_unicos = pd.factorize(rbd)
+        fila_unica = np.minimum(np.searchsorted(self.rbd, rbd_unicos), max(len(self.rbd) - 1, 0))
+        fila = np.append(fila_unica, 0)[codigos_rbd]
+        if len(self.rbd):
+            fila_valida = (
+                (codigos_rbd >= 0)
+                & np.append(self.rbd[fila_unica] == rbd_unicos, False)[codigos_rbd]
+                & (self.coordenadas_rbd[fila, 0] == lat_c)
+                & (self.coordenadas_rbd[fila, 1] == lon_c)
+            )
+        else:
+            fila_valida = np.zeros(len(df), dtype=bool)
+
+        codigos_sede, sedes_unicas = pd.factorize(lat_u + 1j * lon_u)
+        columna = np.append(self._columnas.get_indexer(sedes_unicas), -1)[codigos_sede]
+        en_matriz = fila_valida & (columna >= 0)
+
+        # Cada par (establecimiento, sede) distinto se lee una sola vez desde el disco
+        celdas, celdas_unicas = pd.factorize(fila[en_matriz] * self.forma[1] + columna[en_matriz], sort=True)
+        resultado = np.full(len(df), np.nan)
+        resultado[en_matriz] = self.distancias.reshape(-1)[celdas_unicas][celdas]
+
+        # Filas que la matriz no cubre: cálculo directo con el mismo método
+        faltantes = ~en_matriz
+        if faltantes.any():
+            funcion = distancias.METODOS_DISTANCIA[self.metadatos['metodo']]
+            resultado[faltantes] = funcion(lat_c[faltantes], lon_c[faltantes], lat_u[faltantes], lon_u[faltantes])
+
+        return resultado
+
+
+def huella_matriz(set_c: pd.DataFrame, set_d: pd.DataFrame, metodo: str) -> str:
+    """
+    Huella de las entradas de la matriz: RBD y coordenadas de C, coordenadas de D, método y versión.
+    """
+    return cache.combinar_huellas(
+        VERSION_MATRIZ,
+        cache.huella_dataframe(set_c[['RBD', 'LATITUD_COL', 'LONGITUD_COL']]),
+        cache.huella_dataframe(set_d[['LATITUD_UNI', 'LONGITUD_UNI']]),
+        metodo
+    )[:32]
+
+
+def construir_matriz_distancias(set_c: pd.DataFrame,
+                                set_d: pd.DataFrame,
+                                directorio,
+                                metodo: str = 'haversine') -> MatrizDistancias:
+    """
+    Calcula una vez las distancias RBD x sede y las guarda como matriz float64 en `directorio`.
+
+    Parámetros:
+    -----------
+    set_c : pd.DataFrame
+        Establecimientos con 'RBD', 'LATITUD_COL' y 'LONGITUD_COL' (se usa el primer registro de cada RBD).
+    set_d : pd.DataFrame
+        Sedes con 'LATITUD_UNI' y 'LONGITUD_UNI'.
+    directorio : str o Path
+        Carpeta de salida (se crea si no existe).
+    metodo : str
+        Método de `distancias.METODOS_DISTANCIA`.
+
+    Retorna:
+    --------
+    MatrizDistancias
+        Matriz abierta como memoria mapeada.
+    """
+    if metodo not in distancias.METODOS_DISTANCIA:
+        raise ValueError(f"Método de distancia desconocido: {metodo!r}. Opciones: {list(distancias.METODOS_DISTANCIA)}")
+
+    establecimientos = (
+        set_c[['RBD', 'LATITUD_COL', 'LONGITUD_COL']]
+        .apply(pd.to_numeric, errors='coerce')
+        .dropna(subset=['RBD'])
+        .drop_duplicates(subset=['RBD'], keep='first')
+        .sort_values('RBD')
+    )
+    sedes = (
+        set_d[['LATITUD_UNI', 'LONGITUD_UNI']]
+        .apply(pd.to_numeric, errors='coerce')
+        .dropna()
+        .drop_duplicates()
+    )
+
+    rbd = establecimientos['RBD'].to_numpy(dtype='float64')
+    coordenadas_rbd = establecimientos[['LATITUD_COL', 'LONGITUD_COL']].to_numpy(dtype='float64')
+    coordenadas_sedes = sedes.to_numpy(dtype='float64')
+
+    directorio = Path(directorio)
+    directorio.mkdir(parents=True, exist_ok=True)
+    path_tmp = directorio / 'distancias.tmp.npy'
+
+    funcion = distancias.METODOS_DISTANCIA[metodo]
+    matriz = np.lib.format.open_memmap(path_tmp, mode='w+', dtype=np.float64,
+                                       shape=(len(rbd), len(coordenadas_sedes)))
+    for inicio in range(0, len(rbd), FILAS_POR_BLOQUE):
+        bloque = slice(inicio, inicio + FILAS_POR_BLOQUE)
+        matriz[bloque] = funcion(
+            coordenadas_rbd[bloque, 0][:, None], coordenadas_rbd[bloque, 1][:, None],
+            coordenadas_sedes[:, 0][None, :], coordenadas_sedes[:, 1][None, :]
+        )
+    matriz.flush()
+    del matriz
+    os.replace(path_tmp, directorio / 'distancias.npy')
+
+    np.save(directorio / 'rbd.npy', rbd)
+    np.save(directorio / 'coordenadas_rbd.npy', coordenadas_rbd)
+    np.save(directorio / 'coordenadas_sedes.npy', coordenadas_sedes)
+
+    # Los metadatos se escriben al final: su existencia indica que la matriz está completa
+    metadatos = {
+        'huella': huella_matriz(set_c, set_d, metodo),
+        'metodo': metodo,
+        'forma': [len(rbd), len(coordenadas_sedes)],
+    }
+    with open(directorio / 'metadatos.json', 'w', encoding='utf-8') as f:
+        json.dump(metadatos, f, indent=2)
+
+    return MatrizDistancias(directorio)
+
+
+def cargar_o_construir(set_c: pd.DataFrame,
+                       set_d: pd.DataFrame,
+                       directorio,
+                       metodo: str = 'haversine') -> MatrizDistancias:
+    """
+    Abre la matriz de `directorio` si corresponde a los mismos sets C y D; si no, la recalcula.
+    """
+    path_metadatos = Path(directorio) / 'metadatos.json'
+    if path_metadatos.exists():
+        with open(path_metadatos, encoding='utf-8') as f:
+            metadatos = json.load(f)
+        if metadatos.get('huella') == huella_matriz(set_c, set_d, metodo):
+            return MatrizDistancias(directorio)
+        path_metadatos.unlink()
+
+    return construir_matriz_distancias(set_c, set_d, directorio, metodo)
@@ -0,0 +1,194 @@
+import numpy as np
+import pandas as pd
+
+
+def calcular_estadisticas_movilidad(df: pd.DataFrame,
+                                    col_egreso: str = 'NOMBRE_REGION_EGRESO',
+                                    col_ingreso: str = 'NOMBRE_REGION_INGRESO',
+                                    col_distancia: str = 'DISTANCIA') -> dict:
+    """
+    Calcula en una sola pasada las matrices región de egreso x región de ingreso.
+
+    Las regiones se codifican una vez como enteros: si ambas columnas son categóricas del mismo tipo
+    se usan sus códigos; si no, los valores observados en orden alfabético.
+    El último código se reserva para valores faltantes, que no forman parte de la matriz de
+    movilidad pero sí cuentan como migración o recepción (igual que con `value_counts`).
+
+    Parámetros:
+    -----------
+    df : pd.DataFrame
+        DataFrame con las columnas de región de egreso e ingreso (y opcionalmente distancia).
+    col_egreso, col_ingreso : str
+        Columnas de región de origen y destino.
+    col_distancia : str
+        Columna de distancia. Si es None o no existe, no se calculan las matrices de distancia.
+
+    Retorna:
+    --------
+    dict
+        'regiones' (lista de K nombres) y matrices (K+1)x(K+1): 'conteos', y si hay distancia,
+        'distancia_suma' (sin NaN), 'distancia_validas' y 'distancia_nan'.
+    """
+    regiones, celda = celdas_movilidad(df, col_egreso, col_ingreso)
+    K = len(regiones)
+
+    estadisticas = {'regiones': regiones}
+    distancia = df[col_distancia] if col_distancia is not None and col_distancia in df.columns else None
+    for nombre, matriz in acumular_por_celda(celda, (K + 1) ** 2, distancia).items():
+        estadisticas[nombre] = matriz.reshape(K + 1, K + 1)
+
+    return estadisticas
+
+
+def celdas_movilidad(df: pd.DataFrame,
+                     col_egreso: str = 'NOMBRE_REGION_EGRESO',
+                     col_ingreso: str = 'NOMBRE_REGION_INGRESO') -> tuple:
+    """
+    Codifica cada fila como la celda (egreso, ingreso) de la matriz de movilidad.
+
+    Retorna:
+    --------
+    tuple
+        (lista de K regiones, arreglo de celdas `egreso * (K + 1) + ingreso`), con el código K para
+        regiones faltantes (ver `calcular_estadisticas_movilidad`).
+    """
+    egreso = df[col_egreso]
+    ingreso = df[col_ingreso]
+
+    if isinstance(egreso.dtype, pd.CategoricalDtype) and egreso.dtype == ingreso.dtype:
+        # Columnas ya codificadas (ver `regiones.codificar_regiones`): se usan sus códigos enteros
+        regiones = list(egreso.cat.categories)
+        codigos_egreso = egreso.cat.codes.to_numpy().astype(np.int64)
+        codigos_ingreso = ingreso.cat.codes.to_numpy().astype(np.int64)
+    else:
+        regiones = sorted(set(pd.unique(egreso.dropna())) | set(pd.unique(ingreso.dropna())))
+        dtype = pd.CategoricalDtype(regiones)
+        codigos_egreso = pd.Categorical(egreso, dtype=dtype).codes.astype(np.int64)
+        codigos_ingreso = pd.Categorical(ingreso, dtype=dtype).codes.astype(np.int64)
+
+    K = len(regiones)
+    codigos_egreso[codigos_egreso < 0] = K
+    codigos_ingreso[codigos_ingreso < 0] = K
+
+    return regiones, codigos_egreso * (K + 1) + codigos_ingreso
+
+
+def acumular_por_celda(celda: np.ndarray, n_celdas: int, distancia: pd.Series = None) -> dict:
+    """
+    Conteos (y sumas de distancia) por celda con `np.bincount`, como arreglos planos de largo `n_celdas`.
+
+    Retorna:
+    --------
+    dict
+        'conteos', y si se entrega `distancia`, 'distancia_suma' (sin NaN), 'distancia_validas'
+        y 'distancia_nan'.
+    """
+    acumulados = {'conteos': np.bincount(celda, minlength=n_celdas)}
+
+    if distancia is not None:
+        distancia = distancia.to_numpy(dtype='float64', na_value=np.nan)
+        es_nan = np.isnan(distancia)
+        acumulados['distancia_suma'] = np.bincount(celda, weights=np.where(es_nan, 0.0, distancia),
+                                                   minlength=n_celdas)
+        acumulados['distancia_validas'] = np.bincount(celda[~es_nan], minlength=n_celdas)
+        acumulados['distancia_nan'] = np.bincount(celda[es_nan], minlength=n_celdas)
+
+    return acumulados
+
+
+def matriz_movilidad(estadisticas: dict, index_order: list,
+                     col_egreso: str = 'NOMBRE_REGION_EGRESO',
+                     col_ingreso: str = 'NOMBRE_REGION_INGRESO') -> pd.DataFrame:
+    """
+    Matriz de conteo origen x destino (mismo formato que `pd.crosstab` reindexado a `index_order`).
+    """
+    regiones = estadisticas['regiones']
+    K = len(regiones)
+
+    matriz = pd.DataFrame(
+        estadisticas['conteos'][:K, :K],
+        index=pd.Index(regiones, name=col_egreso),
+        columns=pd.Index(regiones, name=col_ingreso)
+    )
+    return matriz.reindex(index=index_order, columns=index_order, fill_value=0)
+
+
+def _totales_por_region(estadisticas: dict) -> tuple:
+    """
+    Egresados, migrantes, ingresados y foráneos por región (arreglos de largo K).
+    """
+    K = len(estadisticas['regiones'])
+    conteos = estadisticas['conteos']
+    diagonal = np.diag(conteos)[:K]
+
+    egresados = conteos.sum(axis=1)[:K]
+    ingresados = conteos.sum(axis=0)[:K]
+    return egresados, egresados - diagonal, ingresados, ingresados - diagonal
+
+
+def tasas_migracion(estadisticas: dict) -> pd.DataFrame:
+    """
+    Tasas de migración y recepción por región observada (en el orden de `estadisticas['regiones']`).
+
+    Retorna:
+    --------
+    pd.DataFrame
+        DataFrame con columnas 'Región', 'Tasa Migración (%)' y 'Tasa Recepción (%)'.
+    """
+    egresados, migrantes, ingresados, foraneos = _totales_por_region(estadisticas)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        tasa_migracion = np.where(egresados > 0, migrantes / egresados * 100, 0.0)
+        tasa_recepcion = np.where(ingresados > 0, foraneos / ingresados * 100, 0.0)
+
+    presentes = (egresados > 0) | (ingresados > 0)
+    return pd.DataFrame({
+        'Región': np.array(estadisticas['regiones'], dtype=object)[presentes],
+        'Tasa Migración (%)': tasa_migracion[presentes],
+        'Tasa Recepción (%)': tasa_recepcion[presentes],
+    })
+
+
+def distancias_promedio(estadisticas: dict, regiones, excluir_nan: bool = False) -> pd.DataFrame:
+    """
+    Distancia promedio de migración (por egreso) y de recepción (por ingreso) de quienes cambian de región.
+
+    Parámetros:
+    -----------
+    estadisticas : dict
+        Resultado de `calcular_estadisticas_movilidad` (con distancia).
+    regiones : array-like
+        Regiones para las que se reporta el promedio (las no observadas quedan en 0).
+    excluir_nan : bool
+        Si es True, las distancias faltantes se ignoran (equivale a filtrar con `dropna`);
+        si es False, un NaN en el grupo deja el promedio en NaN.
+
+    Retorna:
+    --------
+    pd.DataFrame
+        Columnas 'DISTANCIA_PROMEDIO_MIGRACIÓN' y 'DISTANCIA_PROMEDIO_RECEPCIÓN', una fila por región.
+    """
+    K = len(estadisticas['regiones'])
+    fuera_diagonal = ~np.eye(K + 1, dtype=bool)
+
+    suma = np.where(fuera_diagonal, estadisticas['distancia_suma'], 0.0)
+    if excluir_nan:
+        cantidad = np.where(fuera_diagonal, estadisticas['distancia_validas'], 0)
+        con_nan = np.zeros_like(cantidad)
+    else:
+        cantidad = np.where(fuera_diagonal, estadisticas['conteos'], 0)
+        con_nan = np.where(fuera_diagonal, estadisticas['distancia_nan'], 0)
+
+    def promedio(eje):
+        n = cantidad.sum(axis=eje)[:K]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            valores = np.where(n > 0, suma.sum(axis=eje)[:K] / n, 0.0)
+        return np.where(con_nan.sum(axis=eje)[:K] > 0, np.nan, valores)
+
+    posicion = pd.Index(estadisticas['regiones'], dtype=object).get_indexer(pd.Index(regiones, dtype=object))
+    observada = posicion >= 0
+
+    return pd.DataFrame({
+        'DISTANCIA_PROMEDIO_MIGRACIÓN': np.where(observada, promedio(1)[posicion], 0.0),
+        'DISTANCIA_PROMEDIO_RECEPCIÓN': np.where(observada, promedio(0)[posicion], 0.0),
+    })
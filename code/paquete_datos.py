@@ -0,0 +1,123 @@
+"""
+Paquete binario con todos los datasets de visualización que usa la aplicación.
+
+Uso (después de regenerar `data/plots`):
+    python code/paquete_datos.py
+"""
+import pickle
+import time
+from pathlib import Path
+
+import pandas as pd
+
+try:
+    from . import cache
+except ImportError:
+    import cache
+
+
+# Incrementar si cambia la estructura del paquete
+VERSION_PAQUETE = 1
+
+DIR_PLOTS = Path("data/plots")
+PATH_PAQUETE = DIR_PLOTS / "paquete_plots.pkl"
+
+# Nombre del dataset -> (archivo CSV en data/plots, argumentos de lectura)
+datasets_app = {
+    'tabla1': ('tabla1.csv', {}),
+    'tabla2': ('tabla2.csv', {}),
+    'tabla4': ('tabla4.csv', {}),
+    'df_tipo_universidad': ('df_tipo_universidad.csv', {}),
+    'df_tipodepen': ('df_tipodepen.csv', {}),
+    'df_ivm': ('df_ivm.csv', {}),
+    'df_matriz_movilidad': ('df_matriz_movilidad.csv', {'index_col': 0}),
+    'df_tasas_migracion': ('df_tasas_migracion.csv', {}),
+    'df_migracion_distancia': ('df_migracion_distancia.csv', {}),
+}
+
+
+def huella_fuentes(dir_plots=DIR_PLOTS) -> str:
+    """
+    Huella (tamaño y fecha de modificación) de los CSV que componen el paquete.
+    """
+    dir_plots = Path(dir_plots)
+    return cache.huella_mtime([dir_plots / archivo for archivo, _ in datasets_app.values()])
+
+
+def construir_paquete(dir_plots=DIR_PLOTS, path_paquete=PATH_PAQUETE) -> dict:
+    """
+    Lee todos los datasets de `dir_plots` y los guarda en un único archivo binario versionado.
+
+    Parámetros:
+    -----------
+    dir_plots : str o Path
+        Carpeta con los CSV de visualización.
+    path_paquete : str o Path
+        Archivo de salida.
+
+    Retorna:
+    --------
+    dict
+        Paquete con 'version', 'huella', 'creado' y 'datos' (nombre -> DataFrame).
+    """
+    dir_plots = Path(dir_plots)
+    paquete = {
+        'version': VERSION_PAQUETE,
+        'huella': huella_fuentes(dir_plots),
+        'creado': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'datos': {
+            nombre: pd.read_csv(dir_plots / archivo, **kwargs)
+            for nombre, (archivo, kwargs) in datasets_app.items()
+        },
+    }
+
+    path_paquete = Path(path_paquete)
+    path_tmp = path_paquete.with_suffix('.tmp')
+    with open(path_tmp, 'wb') as f:
+        pickle.dump(paquete, f, protocol=pickle.HIGHEST_PROTOCOL)
+    path_tmp.replace(path_paquete)
+
+    return paquete
+
+
+def cargar_paquete(dir_plots=DIR_PLOTS, path_paquete=PATH_PAQUETE) -> dict:
+    """
+    Carga los datasets de visualización desde el paquete binario.
+
+    Si el paquete no existe, es de otra versión o los CSV cambiaron desde que se creó,
+    se reconstruye desde `dir_plots` (si no se puede escribir, se usan los datos en memoria).
+
+    Parámetros:
+    -----------
+    dir_plots : str o Path
+        Carpeta con los CSV de visualización.
+    path_paquete : str o Path
+        Archivo del paquete.
+
+    Retorna:
+    --------
+    dict
+        Nombre del dataset -> DataFrame.
+    """
+    path_paquete = Path(path_paquete)
+    if path_paquete.exists():
+        try:
+            with open(path_paquete, 'rb') as f:
+                paquete = pickle.load(f)
+            if paquete.get('version') == VERSION_PAQUETE and paquete.get('huella') == huella_fuentes(dir_plots):
+                return paquete['datos']
+        except (pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            pass
+
+    try:
+        return construir_paquete(dir_plots, path_paquete)['datos']
+    except OSError:
+        return {
+            nombre: pd.read_csv(Path(dir_plots) / archivo, **kwargs)
+            for nombre, (archivo, kwargs) in datasets_app.items()
+        }
+
+
+if __name__ == "__main__":
+    paquete = construir_paquete()
+    print(f"Paquete v{paquete['version']} con {len(paquete['datos'])} datasets guardado en {PATH_PAQUETE}")
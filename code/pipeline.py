@@ -0,0 +1,242 @@
+"""
+Procesamiento raw -> clean para varios años en paralelo.
+
+Uso:
+    python code/pipeline.py --raw data/raw --clean data/clean --anios 2021 2022 2023 2024 --workers 4
+"""
+import argparse
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import pandas as pd
+
+try:
+    from . import indice_espacial
+    from . import matriz_distancias
+    from . import utils
+except ImportError:
+    import indice_espacial
+    import matriz_distancias
+    import utils
+
+
+def procesar_anio(path_base: Path,
+                  anio: int,
+                  set_c: pd.DataFrame,
+                  set_d: pd.DataFrame,
+                  output_base: Path,
+                  formato: str = 'csv',
+                  chunksize: int = None,
+                  cache_dir=None,
+                  incremental: bool = False,
+                  dir_matriz_distancias=None,
+                  emparejamiento_difuso: bool = False) -> dict:
+    """
+    Procesa un año completo: lee los sets A, B y E, filtra A0, A y A1, guarda los conjuntos
+    individuales (set_a ... set_e, como en main.ipynb) y genera los conjuntos integrados.
+
+    Parámetros:
+    -----------
+    path_base : Path
+        Carpeta `raw` con una subcarpeta por año.
+    anio : int
+        Año a procesar.
+    set_c, set_d : pd.DataFrame
+        Establecimientos y sedes ya leídos (comunes a todos los años).
+    output_base : Path
+        Carpeta `clean`; la salida se escribe en `output_base/<anio>`.
+    formato : str
+        'csv' o 'parquet'.
+    chunksize : int, opcional
+        Si se indica, el set A se lee por bloques filtrando A0 durante la lectura.
+    cache_dir : str o Path, opcional
+        Carpeta de caché para el Excel IVM (ver `utils.leer_hoja_excel`).
+    incremental : bool
+        Solo recalcula las etapas de unión cuyas entradas cambiaron.
+    dir_matriz_distancias : str o Path, opcional
+        Carpeta de una matriz RBD x sede ya construida; DISTANCIA se lee desde ella.
+    emparejamiento_difuso : bool
+        Une ABC con el set D mediante un crosswalk de sedes con emparejamiento difuso.
+
+    Retorna:
+    --------
+    dict
+        Año, tiempos por etapa (s) y cantidad de filas de A1 y ABCDE.
+    """
+    tiempos = {}
+    paths = utils.obtener_paths_anio(Path(path_base), anio)
+
+    inicio = time.perf_counter()
+    set_a = utils.leer_conjunto_a_desde_path(paths['matricula'], utils.region_dict, chunksize=chunksize, year_A=anio)
+    set_b = utils.leer_conjunto_b_desde_path(paths['puntajes'], utils.region_dict)
+    set_e = utils.leer_conjunto_e_desde_path(paths['ivm'], cache_dir)
+    tiempos['lectura'] = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    resultados_a = utils.generar_conjuntos_filtrados(set_a, anio)
+    set_a1 = resultados_a['A1']
+    tiempos['filtrado'] = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    output_path = Path(output_base) / str(anio)
+    output_path.mkdir(parents=True, exist_ok=True)
+    individuales = {
+        'set_a': set_a,
+        'set_a0': resultados_a['A0'],
+        'set_aa': resultados_a['A'],
+        'set_a1': set_a1,
+        'set_b': set_b,
+        'set_c': set_c,
+        'set_d': set_d,
+        'set_e': set_e,
+    }
+    for nombre_set, df in individuales.items():
+        utils.guardar_conjunto(df, nombre_set, str(output_path), formato)
+    tiempos['escritura_individuales'] = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    conjuntos = utils.generar_conjuntos_abcde(
+        set_a=set_a1,
+        set_b=set_b,
+        set_c=set_c,
+        set_d=set_d,
+        set_e=set_e,
+        output_path=str(output_path),
+        formato=formato,
+        incremental=incremental,
+        matriz_distancias=(
+            matriz_distancias.MatrizDistancias(dir_matriz_distancias) if dir_matriz_distancias else None
+        ),
+        emparejamiento_difuso=emparejamiento_difuso
+    )
+    tiempos['union_y_escritura'] = time.perf_counter() - inicio
+
+    return {
+        'anio': anio,
+        **{f'tiempo_{etapa} (s)': valor for etapa, valor in tiempos.items()},
+        'filas_A1': len(set_a1),
+        'filas_ABCDE': len(conjuntos['set_abcde']),
+    }
+
+
+def procesar_anios(path_base,
+                   anios: list,
+                   output_base,
+                   n_workers: int = None,
+                   anio_shapefiles: int = 2021,
+                   formato: str = 'csv',
+                   chunksize: int = None,
+                   cache_dir=None,
+                   incremental: bool = False,
+                   radios_sedes_km: list = None,
+                   dir_matriz_distancias=None,
+                   emparejamiento_difuso: bool = False) -> pd.DataFrame:
+    """
+    Procesa varios años en paralelo en un pool de procesos.
+
+    Los shapefiles de establecimientos (set C) y sedes (set D) se leen una sola vez desde
+    `anio_shapefiles` y se envían a cada proceso.
+
+    Parámetros:
+    -----------
+    path_base : str o Path
+        Carpeta `raw` con una subcarpeta por año.
+    anios : list
+        Años a procesar.
+    output_base : str o Path
+        Carpeta `clean` de salida.
+    n_workers : int, opcional
+        Cantidad de procesos. Por defecto, uno por año (limitado por la cantidad de CPUs).
+    anio_shapefiles : int
+        Año desde el cual se leen los shapefiles comunes.
+    formato : str
+        'csv' o 'parquet'.
+    chunksize : int, opcional
+        Lectura por bloques del set A (ver `utils.leer_conjunto_a_desde_path`).
+    cache_dir : str o Path, opcional
+        Carpeta de caché para los shapefiles y el Excel IVM (ver `utils.leer_shapefile`).
+    incremental : bool
+        Solo recalcula las etapas de unión cuyas entradas cambiaron (ver `utils.generar_conjuntos_abcde`).
+    radios_sedes_km : list, opcional
+        Si se indica, agrega al set C (y por lo tanto a ABC, ABCD y ABCDE) la sede más cercana y la
+        cantidad de sedes en cada radio (ver `indice_espacial.agregar_sedes_cercanas`).
+    dir_matriz_distancias : str o Path, opcional
+        Carpeta de la matriz de distancias RBD x sede. Se construye una vez (o se reutiliza si
+        los sets C y D no cambiaron) y todos los años leen DISTANCIA desde ella.
+    emparejamiento_difuso : bool
+        Une ABC con el set D mediante un crosswalk de sedes (ver `emparejamiento.construir_crosswalk`).
+
+    Retorna:
+    --------
+    pd.DataFrame
+        Resumen por año con estado, tiempos por etapa y cantidad de filas.
+    """
+    path_base = Path(path_base)
+    paths_comunes = utils.obtener_paths_anio(path_base, anio_shapefiles)
+
+    inicio = time.perf_counter()
+    set_c = pd.DataFrame(utils.leer_conjunto_c_desde_path(paths_comunes['establecimientos'], cache_dir))
+    set_d = pd.DataFrame(utils.leer_conjunto_d_desde_path(paths_comunes['inmuebles_ies'], utils.region_dict, cache_dir))
+    print(f"Shapefiles comunes ({anio_shapefiles}) leídos en {time.perf_counter() - inicio:.1f} s")
+
+    if radios_sedes_km:
+        inicio = time.perf_counter()
+        set_c = indice_espacial.agregar_sedes_cercanas(set_c, set_d, radios_km=radios_sedes_km)
+        print(f"Sedes cercanas de {len(set_c)} establecimientos calculadas en {time.perf_counter() - inicio:.1f} s")
+
+    if dir_matriz_distancias:
+        inicio = time.perf_counter()
+        forma = matriz_distancias.cargar_o_construir(set_c, set_d, dir_matriz_distancias).forma
+        print(f"Matriz de distancias {forma[0]} x {forma[1]} lista en {time.perf_counter() - inicio:.1f} s")
+
+    resumen = []
+    n_workers = n_workers or min(len(anios), os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=n_workers) as pool:
+        futuros = {
+            pool.submit(procesar_anio, path_base, anio, set_c, set_d, output_base, formato, chunksize, cache_dir,
+                        incremental, dir_matriz_distancias, emparejamiento_difuso): anio
+            for anio in anios
+        }
+        for futuro in as_completed(futuros):
+            anio = futuros[futuro]
+            try:
+                resultado = futuro.result()
+                resultado['estado'] = 'ok'
+                print(f"Año {anio} procesado")
+            except Exception:
+                resultado = {'anio': anio, 'estado': 'error', 'detalle': traceback.format_exc(limit=1)}
+                print(f"Error procesando el año {anio}")
+            resumen.append(resultado)
+
+    resumen = pd.DataFrame(resumen).sort_values('anio').reset_index(drop=True)
+    print(resumen.to_string(index=False))
+    return resumen
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Genera los conjuntos clean para varios años en paralelo.")
+    parser.add_argument('--raw', default='data/raw', help="Carpeta con los datos originales por año")
+    parser.add_argument('--clean', default='data/clean', help="Carpeta de salida")
+    parser.add_argument('--anios', nargs='+', type=int, default=[2021, 2022, 2023, 2024])
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--formato', choices=['csv', 'parquet'], default='csv')
+    parser.add_argument('--chunksize', type=int, default=None)
+    parser.add_argument('--cache', default=None, help="Carpeta de caché para fuentes ya procesadas (por ejemplo data/cache)")
+    parser.add_argument('--incremental', action='store_true', help="Recalcula solo las etapas con entradas nuevas")
+    parser.add_argument('--radios-sedes', nargs='+', type=float, default=None,
+                        help="Agrega la sede más cercana y las sedes a estos radios (km) de cada establecimiento")
+    parser.add_argument('--matriz-distancias', default=None,
+                        help="Carpeta de la matriz de distancias RBD x sede (por ejemplo data/cache/distancias); "
+                             "opcional, por defecto DISTANCIA se calcula directamente")
+    parser.add_argument('--emparejamiento-difuso', action='store_true',
+                        help="Empareja sedes A-D con un crosswalk tolerante a diferencias de escritura")
+    args = parser.parse_args()
+
+    procesar_anios(args.raw, args.anios, args.clean, n_workers=args.workers,
+                   formato=args.formato, chunksize=args.chunksize, cache_dir=args.cache,
+                   incremental=args.incremental, radios_sedes_km=args.radios_sedes,
+                   dir_matriz_distancias=args.matriz_distancias,
+                   emparejamiento_difuso=args.emparejamiento_difuso)
@@ -4,15 +4,20 @@ import pandas as pd
 import plotly.graph_objects as go
 import plotly.express as px
 
+try:
+    from . import distancias
+    from . import movilidad
+    from . import regiones
+except ImportError:
+    import distancias
+    import movilidad
+    import regiones
+
 
 # Constantes para visualización 
 R = 6371.0  # Radio de la Tierra en km
 
-orden_regiones = [
-    'Arica y Parinacota', 'Tarapacá', 'Antofagasta', 'Atacama', 'Coquimbo',
-    'Valparaíso', 'Metropolitana', "Lib. Gral B. O'Higgins", 'Maule', 'Ñuble',
-    'Biobío', 'La Araucanía', 'Los Ríos', 'Los Lagos', 'Aysén', 'Magallanes'
-]
+orden_regiones = regiones.orden_regiones
 
 tipos_universidad = [
     'Universidades Estatales CRUCH', 
@@ -20,24 +25,7 @@ tipos_universidad = [
     'Universidades Privadas CRUCH'
 ]
 
-regiones_dict = {
-    1: 'Región de Tarapacá',
-    2: 'Región de Antofagasta',
-    3: 'Región de Atacama',
-    4: 'Región de Coquimbo',
-    5: 'Región de Valparaíso',
-    6: 'Región Metropolitana de Santiago',
-    7: 'Región del Libertador Gral. Bernardo O’Higgins',
-    8: 'Región del Maule',
-    9: 'Región de Biobío',
-    10: 'Región de La Araucanía',
-    11: 'Región de Los Ríos',
-    12: 'Región de Los Lagos',
-    13: 'Región de Aysén del Gral. Carlos Ibáñez del Campo',
-    14: 'Región de Magallanes y de la Antártica Chilena',
-    15: 'Región de Arica y Parinacota',
-    16: 'Región de Ñuble'
-}
+regiones_dict = regiones.codigo_a_nombre_largo
 
 tipodepen_dict = {
     1: 'Municipal',
@@ -47,30 +35,9 @@ tipodepen_dict = {
     5: 'Servicio Local de Educación'
 }
 
-index_order = [
-    'Región de Arica y Parinacota',
-    'Región de Tarapacá',
-    'Región de Antofagasta',
-    'Región de Atacama',
-    'Región de Coquimbo',
-    'Región de Valparaíso',
-    'Región Metropolitana de Santiago',
-    'Región del Libertador Gral. Bernardo O’Higgins',
-    'Región del Maule',
-    'Región de Ñuble',
-    'Región de Biobío',
-    'Región de La Araucanía',
-    'Región de Los Ríos',
-    'Región de Los Lagos',
-    'Región de Aysén del Gral. Carlos Ibáñez del Campo',
-    'Región de Magallanes y de la Antártica Chilena'
-]
+index_order = regiones.orden_regiones_largo
 
-index_order_02 = [
-    'Arica y Parinacota', 'Tarapacá', 'Antofagasta', 'Atacama', 'Coquimbo',
-    'Valparaíso', 'Metropolitana', "Lib. Gral B. O'Higgins", 'Maule', 'Ñuble',
-    'Biobío', 'La Araucanía', 'Los Ríos', 'Los Lagos', 'Aysén', 'Magallanes'
-]
+index_order_02 = regiones.orden_regiones
 
 # DataFrames para visualización
 def preparar_dataset_tipo_universidad(df, tipos_universidad, orden_regiones):
@@ -87,6 +54,13 @@ def preparar_dataset_tipo_universidad(df, tipos_universidad, orden_regiones):
     )
 
     df_grouped = df_filtered_unique.groupby(['region_sede', 'tipo_inst_3'], observed=True).size().unstack(fill_value=0)
+    return porcentajes_tipo_universidad(df_grouped, orden_regiones)
+
+def porcentajes_tipo_universidad(df_grouped, orden_regiones):
+    """
+    Porcentajes por región a partir de los conteos región x tipo de universidad
+    (ver `preparar_dataset_tipo_universidad`).
+    """
     df_porcentaje = df_grouped.div(df_grouped.sum(axis=1), axis=0) * 100
     df_porcentaje = df_porcentaje.reindex(orden_regiones)
 
@@ -115,11 +89,19 @@ def preparar_dataset_tipodepen(df, regiones_dict, tipodepen_dict, index_order):
     df_filtered = df.drop_duplicates(subset=['NOM_RBD', 'COD_REG_RB', 'TIPO_DEPEN']).copy()
 
     df_grouped = df_filtered.groupby(['COD_REG_RB', 'TIPO_DEPEN'], observed=True).size().unstack(fill_value=0)
+    return porcentajes_tipodepen(df_grouped, regiones_dict, tipodepen_dict, index_order)
+
+def porcentajes_tipodepen(df_grouped, regiones_dict, tipodepen_dict, index_order):
+    """
+    Porcentajes por región a partir de los conteos código de región x TIPO_DEPEN
+    (ver `preparar_dataset_tipodepen`).
+    """
     df_porcentaje = df_grouped.div(df_grouped.sum(axis=1), axis=0) * 100
 
     # Mapear nombres
     df_porcentaje.index = df_porcentaje.index.map(regiones_dict)
-    df_porcentaje.columns = df_porcentaje.columns.map(tipodepen_dict)
+    # Etiquetas como texto, sin importar si los códigos llegan como float, Int8 o desde SQL
+    df_porcentaje.columns = df_porcentaje.columns.map(tipodepen_dict).astype('str')
 
     # Reordenar de norte a sur (invertido para horizontal)
     df_porcentaje = df_porcentaje.reindex(index_order[::-1])
@@ -155,6 +137,13 @@ def preparar_dataset_ivm(df, regiones_dict, index_order, valor_corte = 20.03805)
     conteo_total = df_unico_rbd.groupby('CODIGO_REGION_EGRESO').size().reset_index(name='Total_Observaciones')
 
     resultado = pd.merge(conteo_filtrado, conteo_total, on='CODIGO_REGION_EGRESO', how='right')
+    return porcentaje_ivm_por_region(resultado, regiones_dict, index_order)
+
+def porcentaje_ivm_por_region(resultado, regiones_dict, index_order):
+    """
+    Porcentaje de establecimientos sobre el corte a partir de los conteos por región
+    ('CODIGO_REGION_EGRESO', 'Cumple_Condicion', 'Total_Observaciones'; ver `preparar_dataset_ivm`).
+    """
     resultado['Cumple_Condicion'] = resultado['Cumple_Condicion'].fillna(0)
     resultado['Porcentaje'] = (resultado['Cumple_Condicion'] / resultado['Total_Observaciones']) * 100
 
@@ -180,13 +169,8 @@ def preparar_matriz_movilidad(df, index_order):
     matriz : pd.DataFrame
         Matriz de conteo entre regiones de origen y destino (reordenada).
     """
-    matriz = pd.crosstab(
-        df['NOMBRE_REGION_EGRESO'],
-        df['NOMBRE_REGION_INGRESO']
-    )
-
-    matriz = matriz.reindex(index=index_order, columns=index_order, fill_value=0)
-    return matriz
+    estadisticas = movilidad.calcular_estadisticas_movilidad(df, col_distancia=None)
+    return movilidad.matriz_movilidad(estadisticas, index_order)
 
 def preparar_tasas_migracion_recepcion(df, orden_regiones):
     """
@@ -204,22 +188,12 @@ def preparar_tasas_migracion_recepcion(df, orden_regiones):
     df_tasas : pd.DataFrame
         DataFrame con columnas 'Región', 'Tasa Migración (%)' y 'Tasa Recepción (%)'.
     """
-    cols = ["NOMBRE_REGION_EGRESO", "NOMBRE_REGION_INGRESO"]
-    df_migracion = df[cols].copy()
-
-    total_egresados = df_migracion["NOMBRE_REGION_EGRESO"].value_counts()
-    migrantes = df_migracion[df_migracion["NOMBRE_REGION_EGRESO"] != df_migracion["NOMBRE_REGION_INGRESO"]]["NOMBRE_REGION_EGRESO"].value_counts()
-    tasa_migracion = (migrantes / total_egresados).fillna(0) * 100
-
-    total_ingresados = df_migracion["NOMBRE_REGION_INGRESO"].value_counts()
-    foraneos = df_migracion[df_migracion["NOMBRE_REGION_EGRESO"] != df_migracion["NOMBRE_REGION_INGRESO"]]["NOMBRE_REGION_INGRESO"].value_counts()
-    tasa_recepcion = (foraneos / total_ingresados).fillna(0) * 100
-
-    df_tasas = pd.DataFrame({
-        "Tasa Migración (%)": tasa_migracion,
-        "Tasa Recepción (%)": tasa_recepcion
-    }).fillna(0).reset_index().rename(columns={'index': 'Región'})
+    estadisticas = movilidad.calcular_estadisticas_movilidad(df, col_distancia=None)
+    return ordenar_tasas(movilidad.tasas_migracion(estadisticas), orden_regiones)
 
+def ordenar_tasas(df_tasas, orden_regiones):
+    """Ordena las tasas por región de norte a sur (las regiones fuera de `orden_regiones` quedan al final)."""
+    df_tasas = df_tasas.copy()
     df_tasas['Región'] = pd.Categorical(df_tasas['Región'], categories=orden_regiones, ordered=True)
     df_tasas = df_tasas.sort_values('Región')
 
@@ -236,66 +210,80 @@ def haversine(lat1, lon1, lat2, lon2):
 
 def calcular_tasas_migracion(df):
     """Calcula tasas de migración y recepción por región."""
-    df_migracion = df[['NOMBRE_REGION_EGRESO', 'NOMBRE_REGION_INGRESO']]
-
-    total_egresados = df_migracion["NOMBRE_REGION_EGRESO"].value_counts()
-    migrantes = df_migracion[df_migracion["NOMBRE_REGION_EGRESO"] != df_migracion["NOMBRE_REGION_INGRESO"]]["NOMBRE_REGION_EGRESO"].value_counts()
-    tasa_migracion = (migrantes / total_egresados).fillna(0) * 100
-
-    total_ingresados = df_migracion["NOMBRE_REGION_INGRESO"].value_counts()
-    foraneos = df_migracion[df_migracion["NOMBRE_REGION_EGRESO"] != df_migracion["NOMBRE_REGION_INGRESO"]]["NOMBRE_REGION_INGRESO"].value_counts()
-    tasa_recepcion = (foraneos / total_ingresados).fillna(0) * 100
-
-    df_tasas = pd.DataFrame({
-        "Tasa Migración (%)": tasa_migracion,
-        "Tasa Recepción (%)": tasa_recepcion
-    }).fillna(0).reset_index().rename(columns={'index': 'Región'})
-
-    return df_tasas
+    estadisticas = movilidad.calcular_estadisticas_movilidad(df, col_distancia=None)
+    return movilidad.tasas_migracion(estadisticas)
 
 def calcular_distancias(df):
     """Agrega columna DISTANCIA en base a Haversine y elimina filas NaN."""
-    df['DISTANCIA'] = df.apply(
-        lambda row: haversine(row['LATITUD_COL'], row['LONGITUD_COL'], row['LATITUD_UNI'], row['LONGITUD_UNI']),
-        axis=1
-    )
+    df['DISTANCIA'] = distancias.calcular_distancia_columnas(df)
     df_filtrado = df.dropna(subset=['DISTANCIA'])
     #print(f"Cantidad de observaciones: {df_filtrado.shape[0]}")
     return df_filtrado
 
 
 def calcular_distancias_promedio(df_distancias, df_tasas):
-    """Calcula distancia promedio de migración y recepción por región."""
-    df_resultado = df_tasas.copy()
-    df_resultado['DISTANCIA_PROMEDIO_MIGRACIÓN'] = 0.0
-    df_resultado['DISTANCIA_PROMEDIO_RECEPCIÓN'] = 0.0
-
-    migracion_count = {region: 0 for region in df_resultado['Región']}
-    recepcion_count = {region: 0 for region in df_resultado['Región']}
-
-    for _, row in df_distancias.iterrows():
-        egreso = row['NOMBRE_REGION_EGRESO']
-        ingreso = row['NOMBRE_REGION_INGRESO']
-        distancia = row['DISTANCIA']
-
-        if egreso != ingreso:
-            if egreso in migracion_count:
-                df_resultado.loc[df_resultado['Región'] == egreso, 'DISTANCIA_PROMEDIO_MIGRACIÓN'] += distancia
-                migracion_count[egreso] += 1
-            if ingreso in recepcion_count:
-                df_resultado.loc[df_resultado['Región'] == ingreso, 'DISTANCIA_PROMEDIO_RECEPCIÓN'] += distancia
-                recepcion_count[ingreso] += 1
-
-    df_resultado['DISTANCIA_PROMEDIO_MIGRACIÓN'] = df_resultado.apply(
-        lambda row: row['DISTANCIA_PROMEDIO_MIGRACIÓN'] / max(migracion_count.get(row['Región'], 1), 1), axis=1
-    )
+    """
+    Calcula distancia promedio de migración y recepción por región.
 
-    df_resultado['DISTANCIA_PROMEDIO_RECEPCIÓN'] = df_resultado.apply(
-        lambda row: row['DISTANCIA_PROMEDIO_RECEPCIÓN'] / max(recepcion_count.get(row['Región'], 1), 1), axis=1
-    )
+    Solo se consideran estudiantes que cambian de región (egreso != ingreso). Las regiones sin
+    migrantes quedan con distancia 0.
+    """
+    estadisticas = movilidad.calcular_estadisticas_movilidad(df_distancias)
+    promedios = movilidad.distancias_promedio(estadisticas, df_tasas['Región'])
+
+    df_resultado = df_tasas.copy()
+    for columna in promedios.columns:
+        df_resultado[columna] = promedios[columna].to_numpy()
 
     return df_resultado
 
+def preparar_datasets_movilidad(df, index_order, orden_regiones):
+    """
+    Prepara la matriz de movilidad, las tasas y las distancias promedio con una sola pasada sobre `df`.
+
+    Equivale a `preparar_matriz_movilidad`, `preparar_tasas_migracion_recepcion` y a
+    `calcular_distancias_promedio(calcular_distancias(df), calcular_tasas_migracion(df))`,
+    sin agregar la columna DISTANCIA a `df` si no existe.
+
+    Parámetros:
+    -----------
+    df : pd.DataFrame
+        DataFrame con regiones de egreso e ingreso y coordenadas (o la columna 'DISTANCIA').
+    index_order : list
+        Orden de las regiones para la matriz.
+    orden_regiones : list
+        Lista con el orden de las regiones de norte a sur.
+
+    Retorna:
+    --------
+    dict
+        'matriz', 'tasas' y 'migracion_distancia'.
+    """
+    if 'DISTANCIA' not in df.columns:
+        df = df.assign(DISTANCIA=distancias.calcular_distancia_columnas(df))
+
+    estadisticas = movilidad.calcular_estadisticas_movilidad(df)
+    return preparar_datasets_desde_estadisticas(estadisticas, index_order, orden_regiones)
+
+def preparar_datasets_desde_estadisticas(estadisticas, index_order, orden_regiones):
+    """
+    Matriz, tasas y distancias promedio (ver `preparar_datasets_movilidad`) a partir de estadísticas
+    ya acumuladas, por ejemplo las de un corte de `cubo_movilidad.CuboMovilidad`.
+    """
+    df_tasas = movilidad.tasas_migracion(estadisticas)
+
+    # Las distancias faltantes se excluyen, como hace `calcular_distancias`
+    migracion_distancia = df_tasas.copy()
+    promedios = movilidad.distancias_promedio(estadisticas, df_tasas['Región'], excluir_nan=True)
+    for columna in promedios.columns:
+        migracion_distancia[columna] = promedios[columna].to_numpy()
+
+    return {
+        'matriz': movilidad.matriz_movilidad(estadisticas, index_order),
+        'tasas': ordenar_tasas(df_tasas, orden_regiones),
+        'migracion_distancia': migracion_distancia,
+    }
+
 # Gráficos para visualización
 def plotly_tipo_universidad_por_region(df_porcentaje):
     """
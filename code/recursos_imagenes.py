@@ -0,0 +1,272 @@
+"""
+Variantes redimensionadas y comprimidas de las figuras estáticas de la aplicación.
+
+Por cada figura se generan versiones WebP y PNG optimizado en varios anchos, una miniatura y
+un manifiesto JSON que la aplicación lee para elegir la variante adecuada. Las variantes se
+guardan en `static/` para que Streamlit las sirva como archivos estáticos.
+
+Uso (después de agregar o modificar figuras en `images/figuras`):
+    python code/recursos_imagenes.py
+"""
+import json
+import time
+from pathlib import Path
+
+from PIL import Image
+
+try:
+    from . import cache
+except ImportError:
+    import cache
+
+
+# Incrementar si cambia la forma de generar las variantes o la estructura del manifiesto
+VERSION_MANIFIESTO = 1
+
+DIR_FIGURAS = Path("images/figuras")
+DIR_VARIANTES = Path("static/figuras")
+PATH_MANIFIESTO = Path("static/manifiesto_imagenes.json")
+
+# Prefijo de URL con que Streamlit sirve la carpeta `static` (server.enableStaticServing)
+URL_STATIC = "app/static"
+
+# Anchos (px) de las variantes; se omiten los mayores que la figura original
+ANCHOS_VARIANTES = (400, 800, 1600)
+ANCHO_MINIATURA = 240
+
+CALIDAD_WEBP = 80
+COLORES_PNG = 256
+
+
+def _guardar_variante(imagen: Image.Image, path: Path, formato: str) -> int:
+    """
+    Guarda una variante en WebP o PNG optimizado y retorna su tamaño en bytes.
+
+    El PNG se reduce a una paleta de `COLORES_PNG` colores sin tramado: los gráficos tienen pocos
+    colores planos y el redimensionado solo agrega tonos intermedios en los bordes.
+    """
+    if formato == 'webp':
+        imagen.save(path, format='WEBP', quality=CALIDAD_WEBP, method=4)
+    else:
+        paleta = imagen.quantize(COLORES_PNG, method=Image.Quantize.FASTOCTREE, dither=Image.Dither.NONE)
+        paleta.save(path, format='PNG', optimize=True)
+    return path.stat().st_size
+
+
+def generar_variantes_imagen(path_imagen, dir_variantes=DIR_VARIANTES) -> dict:
+    """
+    Genera las variantes de una figura en cada ancho de `ANCHOS_VARIANTES` y su miniatura.
+
+    Parámetros:
+    -----------
+    path_imagen : str o Path
+        Figura original.
+    dir_variantes : str o Path
+        Carpeta de salida; los archivos se llaman `<nombre>_<ancho>.<formato>` y `<nombre>_mini.webp`.
+
+    Retorna:
+    --------
+    dict
+        Entrada del manifiesto: 'huella', 'ancho', 'alto', 'bytes', 'variantes' (una por ancho y formato)
+        y 'miniatura'.
+    """
+    path_imagen = Path(path_imagen)
+    dir_variantes = Path(dir_variantes)
+    dir_variantes.mkdir(parents=True, exist_ok=True)
+
+    with Image.open(path_imagen) as original:
+        original.load()
+    ancho, alto = original.size
+    # WebP y PNG conservan la transparencia; los modos de paleta se expanden antes de redimensionar
+    modo = 'RGBA' if original.mode in ('RGBA', 'LA', 'P') else 'RGB'
+    original = original.convert(modo)
+
+    anchos = sorted({min(a, ancho) for a in ANCHOS_VARIANTES})
+    variantes = []
+    for ancho_variante in anchos:
+        alto_variante = round(alto * ancho_variante / ancho)
+        imagen = original if ancho_variante == ancho else original.resize(
+            (ancho_variante, alto_variante), resample=Image.LANCZOS
+        )
+        for formato in ('webp', 'png'):
+            path = dir_variantes / f"{path_imagen.stem}_{ancho_variante}.{formato}"
+            variantes.append({
+                'ancho': ancho_variante,
+                'alto': alto_variante,
+                'formato': formato,
+                'archivo': path.name,
+                'bytes': _guardar_variante(imagen, path, formato),
+            })
+
+    miniatura = original.copy()
+    miniatura.thumbnail((ANCHO_MINIATURA, ANCHO_MINIATURA * alto // ancho + 1), resample=Image.LANCZOS)
+    path_miniatura = dir_variantes / f"{path_imagen.stem}_mini.webp"
+    _guardar_variante(miniatura, path_miniatura, 'webp')
+
+    return {
+        'huella': cache.huella_mtime([path_imagen]),
+        'ancho': ancho,
+        'alto': alto,
+        'bytes': path_imagen.stat().st_size,
+        'variantes': variantes,
+        'miniatura': path_miniatura.name,
+    }
+
+
+def _archivos_completos(entrada: dict, dir_variantes) -> bool:
+    """
+    True si existen en `dir_variantes` todos los archivos de una entrada (variantes y miniatura).
+    """
+    archivos = [v['archivo'] for v in entrada['variantes']] + [entrada['miniatura']]
+    return all((Path(dir_variantes) / archivo).exists() for archivo in archivos)
+
+
+def construir_manifiesto(dir_figuras=DIR_FIGURAS,
+                         dir_variantes=DIR_VARIANTES,
+                         path_manifiesto=PATH_MANIFIESTO) -> dict:
+    """
+    Genera las variantes de todas las figuras de `dir_figuras` y guarda el manifiesto.
+
+    Solo se regeneran las figuras nuevas o modificadas desde el manifiesto anterior.
+
+    Parámetros:
+    -----------
+    dir_figuras : str o Path
+        Carpeta con las figuras originales (PNG).
+    dir_variantes : str o Path
+        Carpeta de salida de las variantes.
+    path_manifiesto : str o Path
+        Archivo JSON del manifiesto.
+
+    Retorna:
+    --------
+    dict
+        Manifiesto con 'version', 'creado' e 'imagenes' (nombre del archivo original -> entrada).
+    """
+    dir_variantes = Path(dir_variantes)
+    path_manifiesto = Path(path_manifiesto)
+    anterior = leer_manifiesto(path_manifiesto)
+    imagenes_anteriores = anterior.get('imagenes', {}) if anterior.get('version') == VERSION_MANIFIESTO else {}
+
+    imagenes = {}
+    for path_imagen in sorted(Path(dir_figuras).glob('*.png')):
+        entrada = imagenes_anteriores.get(path_imagen.name)
+        vigente = (
+            entrada is not None
+            and entrada['huella'] == cache.huella_mtime([path_imagen])
+            and _archivos_completos(entrada, dir_variantes)
+        )
+        imagenes[path_imagen.name] = entrada if vigente else generar_variantes_imagen(path_imagen, dir_variantes)
+
+    manifiesto = {
+        'version': VERSION_MANIFIESTO,
+        'creado': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'imagenes': imagenes,
+    }
+
+    path_manifiesto.parent.mkdir(parents=True, exist_ok=True)
+    path_tmp = path_manifiesto.with_suffix('.tmp')
+    with open(path_tmp, 'w', encoding='utf-8') as f:
+        json.dump(manifiesto, f, indent=2)
+    path_tmp.replace(path_manifiesto)
+
+    return manifiesto
+
+
+def leer_manifiesto(path_manifiesto=PATH_MANIFIESTO) -> dict:
+    """
+    Lee el manifiesto de variantes; retorna un diccionario vacío si no existe o no se puede leer.
+    """
+    path_manifiesto = Path(path_manifiesto)
+    if not path_manifiesto.exists():
+        return {}
+    try:
+        with open(path_manifiesto, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+def huella_figuras(dir_figuras=DIR_FIGURAS) -> str:
+    """
+    Huella (tamaño y fecha de modificación) de las figuras originales.
+    """
+    return cache.huella_mtime(sorted(Path(dir_figuras).glob('*.png')))
+
+
+def cargar_manifiesto(dir_figuras=DIR_FIGURAS,
+                      dir_variantes=DIR_VARIANTES,
+                      path_manifiesto=PATH_MANIFIESTO) -> dict:
+    """
+    Retorna el manifiesto vigente, regenerando las variantes y miniaturas que falten (aunque el
+    manifiesto las liste) o estén desactualizadas.
+
+    Si no se pueden escribir las variantes (por ejemplo, en un sistema de archivos de solo lectura),
+    retorna un manifiesto vacío y la aplicación usa las figuras originales.
+    """
+    manifiesto = leer_manifiesto(path_manifiesto)
+    figuras = sorted(Path(dir_figuras).glob('*.png'))
+    vigente = (
+        manifiesto.get('version') == VERSION_MANIFIESTO
+        and set(manifiesto.get('imagenes', {})) == {p.name for p in figuras}
+        and all(manifiesto['imagenes'][p.name]['huella'] == cache.huella_mtime([p]) for p in figuras)
+        and all(_archivos_completos(entrada, dir_variantes) for entrada in manifiesto['imagenes'].values())
+    )
+    if vigente:
+        return manifiesto
+
+    try:
+        return construir_manifiesto(dir_figuras, dir_variantes, path_manifiesto)
+    except OSError:
+        return {}
+
+
+def elegir_variante(manifiesto: dict, nombre: str, ancho: int, formato: str = 'webp') -> dict:
+    """
+    Variante más pequeña de `nombre` con ancho mayor o igual a `ancho` (o la más ancha disponible).
+
+    Parámetros:
+    -----------
+    manifiesto : dict
+        Resultado de `cargar_manifiesto`.
+    nombre : str
+        Archivo original (por ejemplo '15.png').
+    ancho : int
+        Ancho de despliegue en píxeles.
+    formato : str
+        'webp' o 'png'.
+
+    Retorna:
+    --------
+    dict
+        Entrada de la variante ('ancho', 'alto', 'formato', 'archivo', 'bytes'), o None si la figura
+        no está en el manifiesto.
+    """
+    entrada = manifiesto.get('imagenes', {}).get(nombre)
+    if entrada is None:
+        return None
+
+    candidatas = sorted((v for v in entrada['variantes'] if v['formato'] == formato), key=lambda v: v['ancho'])
+    if not candidatas:
+        return None
+    return next((v for v in candidatas if v['ancho'] >= ancho), candidatas[-1])
+
+
+def srcset(manifiesto: dict, nombre: str, formato: str = 'webp', url_base: str = f"{URL_STATIC}/figuras") -> str:
+    """
+    Atributo `srcset` con todas las variantes de `nombre` en `formato` (por ejemplo '15_400.webp 400w, ...').
+    """
+    entrada = manifiesto.get('imagenes', {}).get(nombre, {})
+    return ', '.join(
+        f"{url_base}/{v['archivo']} {v['ancho']}w"
+        for v in sorted(entrada.get('variantes', []), key=lambda v: v['ancho'])
+        if v['formato'] == formato
+    )
+
+
+if __name__ == "__main__":
+    manifiesto = construir_manifiesto()
+    total_original = sum(e['bytes'] for e in manifiesto['imagenes'].values())
+    total_800 = sum(elegir_variante(manifiesto, n, 800)['bytes'] for n in manifiesto['imagenes'])
+    print(f"Variantes de {len(manifiesto['imagenes'])} figuras guardadas en {DIR_VARIANTES} "
+          f"(originales: {total_original / 1024:.0f} KB, WebP a 800 px: {total_800 / 1024:.0f} KB)")
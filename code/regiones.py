@@ -0,0 +1,239 @@
+import re
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+
+# Registro canónico de regiones, de norte a sur: (código CUT, nombre corto, nombre largo).
+# El nombre corto es el que usan los conjuntos de datos; el largo se usa solo al visualizar.
+registro_regiones = [
+    (15, 'Arica y Parinacota', 'Región de Arica y Parinacota'),
+    (1, 'Tarapacá', 'Región de Tarapacá'),
+    (2, 'Antofagasta', 'Región de Antofagasta'),
+    (3, 'Atacama', 'Región de Atacama'),
+    (4, 'Coquimbo', 'Región de Coquimbo'),
+    (5, 'Valparaíso', 'Región de Valparaíso'),
+    (13, 'Metropolitana', 'Región Metropolitana de Santiago'),
+    (6, "Lib. Gral B. O'Higgins", 'Región del Libertador Gral. Bernardo O’Higgins'),
+    (7, 'Maule', 'Región del Maule'),
+    (16, 'Ñuble', 'Región de Ñuble'),
+    (8, 'Biobío', 'Región de Biobío'),
+    (9, 'La Araucanía', 'Región de La Araucanía'),
+    (14, 'Los Ríos', 'Región de Los Ríos'),
+    (10, 'Los Lagos', 'Región de Los Lagos'),
+    (11, 'Aysén', 'Región de Aysén del Gral. Carlos Ibáñez del Campo'),
+    (12, 'Magallanes', 'Región de Magallanes y de la Antártica Chilena'),
+]
+
+# Vistas derivadas del registro
+orden_regiones = [nombre for _, nombre, _ in registro_regiones]
+orden_regiones_largo = [largo for _, _, largo in registro_regiones]
+codigo_a_nombre = {codigo: nombre for codigo, nombre, _ in registro_regiones}
+codigo_a_nombre_largo = {codigo: largo for codigo, _, largo in registro_regiones}
+nombre_a_codigo = {nombre: codigo for codigo, nombre, _ in registro_regiones}
+nombre_a_nombre_largo = {nombre: largo for _, nombre, largo in registro_regiones}
+
+# Tipo categórico ordenado de norte a sur (los códigos internos caben en int8)
+tipo_region = pd.CategoricalDtype(orden_regiones, ordered=True)
+
+# Columnas con nombre corto de región en los conjuntos
+columnas_region = ['NOMBRE_REGION_EGRESO', 'NOMBRE_REGION_INGRESO', 'REGIÓN']
+
+
+def codificar_regiones(valores) -> pd.Series:
+    """
+    Convierte nombres cortos o códigos CUT de región en un categórico ordenado de norte a sur.
+
+    Los valores que no están en el registro se agregan como categorías al final (no se pierden),
+    de modo que los códigos siguen siendo enteros pequeños.
+
+    Parámetros:
+    -----------
+    valores : pd.Series o array-like
+        Nombres cortos de región o códigos CUT (enteros).
+
+    Retorna:
+    --------
+    pd.Series
+        Serie categórica ordenada.
+    """
+    serie = valores if isinstance(valores, pd.Series) else pd.Series(valores)
+    if pd.api.types.is_numeric_dtype(serie):
+        serie = serie.map(codigo_a_nombre)
+
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        observados = serie.cat.categories[serie.cat.codes[serie.cat.codes >= 0].unique()]
+    else:
+        observados = pd.unique(serie.dropna())
+
+    extra = sorted(set(observados) - set(orden_regiones), key=str)
+    dtype = tipo_region if not extra else pd.CategoricalDtype(orden_regiones + extra, ordered=True)
+    if serie.dtype == dtype:
+        return serie
+    return serie.astype(object).astype(dtype)
+
+
+def codigos_region(valores) -> np.ndarray:
+    """
+    Retorna la posición norte-sur (0..15) de cada región como int8, con -1 para faltantes o desconocidas.
+    """
+    serie = codificar_regiones(valores)
+    codigos = serie.cat.codes.to_numpy().astype(np.int8)
+    codigos[codigos >= len(orden_regiones)] = -1
+    return codigos
+
+
+def codificar_columnas_region(df: pd.DataFrame, columnas: list = None) -> pd.DataFrame:
+    """
+    Convierte las columnas de región presentes en `df` a categóricos ordenados (en el lugar).
+
+    Parámetros:
+    -----------
+    df : pd.DataFrame
+        DataFrame a modificar.
+    columnas : list, opcional
+        Columnas a convertir. Por defecto, las de `columnas_region` que existan en `df`.
+
+    Retorna:
+    --------
+    pd.DataFrame
+        El mismo DataFrame, con las columnas convertidas.
+    """
+    if columnas is None:
+        columnas = [c for c in columnas_region if c in df.columns]
+
+    for columna in columnas:
+        df[columna] = codificar_regiones(df[columna])
+
+    return df
+
+
+def nombres_largos(valores) -> pd.Series:
+    """
+    Nombre largo ('Región de …') para visualización a partir de nombres cortos o códigos CUT.
+    """
+    serie = valores if isinstance(valores, pd.Series) else pd.Series(valores)
+    if pd.api.types.is_numeric_dtype(serie):
+        return serie.map(codigo_a_nombre_largo)
+    return serie.astype(object).map(nombre_a_nombre_largo)
+
+
+# Abreviaciones y grafías alternativas que se unifican al normalizar
+equivalencias_palabras = {
+    'GENERAL': 'GRAL',
+    'AISEN': 'AYSEN',
+}
+
+
+def normalizar_texto(valor: str) -> str:
+    """
+    Normaliza un nombre para compararlo: sin tildes, en mayúsculas, sin puntuación y con espacios simples.
+    """
+    texto = unicodedata.normalize('NFKD', str(valor))
+    texto = ''.join(c for c in texto if not unicodedata.combining(c)).upper()
+    texto = re.sub(r"[^\w\s]", '', texto)
+    palabras = [equivalencias_palabras.get(p, p) for p in texto.split()]
+    return ' '.join(palabras)
+
+
+def _nucleo(texto_normalizado: str) -> str:
+    """
+    Quita el prefijo 'REGION [DE|DEL]' de un nombre ya normalizado.
+    """
+    return re.sub(r'^REGION\s+(?:(?:DE|DEL)\s+)?', '', texto_normalizado)
+
+
+def construir_tabla_normalizacion(variantes: dict = None) -> dict:
+    """
+    Construye la tabla nombre normalizado -> nombre corto canónico.
+
+    Incluye los nombres cortos y largos del registro y, opcionalmente, un diccionario de variantes
+    (por ejemplo `utils.region_dict`). Cada nombre se indexa completo y sin el prefijo 'Región de'.
+
+    Parámetros:
+    -----------
+    variantes : dict, opcional
+        Grafía conocida -> nombre corto canónico.
+
+    Retorna:
+    --------
+    dict
+        Clave normalizada -> nombre corto.
+    """
+    pares = [(nombre, nombre) for nombre in orden_regiones]
+    pares += [(largo, nombre) for _, nombre, largo in registro_regiones]
+    pares += list((variantes or {}).items())
+
+    tabla = {}
+    for grafia, nombre in pares:
+        clave = normalizar_texto(grafia)
+        tabla.setdefault(clave, nombre)
+        tabla.setdefault(_nucleo(clave), nombre)
+    return tabla
+
+
+def resolver_region(valor, tabla: dict):
+    """
+    Retorna el nombre corto canónico de `valor`, o None si no hay equivalencia.
+    """
+    clave = normalizar_texto(valor)
+    return tabla.get(clave, tabla.get(_nucleo(clave)))
+
+
+def estandarizar_regiones(valores, variantes: dict = None, reportar: bool = True) -> pd.Series:
+    """
+    Estandariza nombres de región y los retorna como categórico ordenado de norte a sur.
+
+    Cada valor distinto se resuelve una sola vez (primero exacto en `variantes`, luego por su forma
+    normalizada sin tildes ni mayúsculas) y el resultado se propaga a todas las filas vía códigos.
+    Los valores sin equivalencia se conservan tal cual (como hacía `Series.replace`) y se reportan.
+
+    Parámetros:
+    -----------
+    valores : pd.Series
+        Nombres de región en cualquier grafía.
+    variantes : dict, opcional
+        Grafía conocida -> nombre corto canónico (por ejemplo `utils.region_dict`).
+    reportar : bool
+        Si es True, imprime los valores sin equivalencia y su cantidad de filas.
+
+    Retorna:
+    --------
+    pd.Series
+        Serie categórica ordenada (mismo índice y nombre que `valores`), con la lista de valores
+        sin equivalencia en `attrs['regiones_sin_equivalencia']`.
+    """
+    serie = valores if isinstance(valores, pd.Series) else pd.Series(valores)
+    variantes = variantes or {}
+    tabla = construir_tabla_normalizacion(variantes)
+
+    codigos, unicos = pd.factorize(serie)
+    resueltos = []
+    sin_equivalencia = []
+    for i, valor in enumerate(unicos):
+        nombre = variantes.get(valor) or resolver_region(valor, tabla)
+        if nombre is None:
+            nombre = valor
+            if str(valor).strip():
+                sin_equivalencia.append(i)
+        resueltos.append(nombre)
+
+    extra = sorted(set(resueltos) - set(orden_regiones), key=str)
+    dtype = pd.CategoricalDtype(orden_regiones + extra, ordered=True)
+
+    # Código por valor distinto; el último elemento (-1) corresponde a los faltantes
+    posiciones = np.append(dtype.categories.get_indexer(pd.Index(resueltos, dtype=object)), -1)
+    resultado = pd.Series(
+        pd.Categorical.from_codes(posiciones[codigos], dtype=dtype),
+        index=serie.index,
+        name=serie.name
+    )
+
+    if reportar and sin_equivalencia:
+        filas = np.bincount(codigos[codigos >= 0], minlength=len(unicos))
+        detalle = ', '.join(f"{unicos[i]!r} ({filas[i]})" for i in sin_equivalencia)
+        print(f"Regiones sin equivalencia en {serie.name}: {detalle}")
+
+    resultado.attrs['regiones_sin_equivalencia'] = [unicos[i] for i in sin_equivalencia]
+    return resultado
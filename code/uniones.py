@@ -0,0 +1,206 @@
+import numpy as np
+import pandas as pd
+
+
+# Clave máxima para indexar la tabla derecha con un arreglo de acceso directo (RBD cabe; mrun no)
+LIMITE_TABLA_DIRECTA = 1 << 22
+
+
+def _claves_numericas(serie: pd.Series) -> np.ndarray:
+    """
+    Claves enteras (RBD, mrun) como float64, con NaN donde faltan o no son numéricas.
+    """
+    return pd.to_numeric(serie, errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+
+
+def _posiciones_directas(claves_derecha: np.ndarray, claves: np.ndarray) -> np.ndarray:
+    """
+    Posición en la derecha de cada clave (-1 sin pareja) con una tabla de acceso directo indexada por
+    la clave. Requiere claves de la derecha únicas, enteras, no negativas y menores que
+    `LIMITE_TABLA_DIRECTA` (como RBD); retorna None si no se cumple.
+    """
+    validas = claves_derecha[~np.isnan(claves_derecha)]
+    if not len(validas) or validas.min() < 0 or validas.max() >= LIMITE_TABLA_DIRECTA:
+        return None
+    enteras_derecha = validas.astype(np.int64)
+    if not np.array_equal(enteras_derecha, validas):
+        return None
+
+    tabla = np.full(int(enteras_derecha.max()) + 1, -1, dtype=np.int64)
+    tabla[enteras_derecha] = np.flatnonzero(~np.isnan(claves_derecha))
+    if (tabla >= 0).sum() < len(enteras_derecha):
+        return None
+
+    with np.errstate(invalid='ignore'):
+        enteras = claves.astype(np.int64)
+    en_rango = (enteras >= 0) & (enteras < len(tabla)) & (enteras == claves)
+    posiciones = np.full(len(claves), -1, dtype=np.int64)
+    posiciones[en_rango] = tabla[enteras[en_rango]]
+    return posiciones
+
+
+def _posiciones(claves_derecha: np.ndarray, claves: np.ndarray) -> np.ndarray:
+    """
+    Posición en la derecha de cada clave (-1 sin pareja), o None si la derecha tiene claves repetidas.
+
+    Las claves tipo RBD se resuelven con `_posiciones_directas`; el resto (por ejemplo mrun) con un
+    índice hash construido una sola vez sobre la derecha.
+    """
+    posiciones = _posiciones_directas(claves_derecha, claves)
+    if posiciones is not None:
+        return posiciones
+
+    # Las claves faltantes no se emparejan entre sí: se excluyen del índice y de la búsqueda
+    filas_validas = np.flatnonzero(~np.isnan(claves_derecha))
+    indice = pd.Index(claves_derecha[filas_validas])
+    if not indice.is_unique:
+        return None
+    encontradas = indice.get_indexer(claves)
+    encontradas[np.isnan(claves)] = -1
+    return np.where(encontradas >= 0, np.append(filas_validas, -1)[encontradas], -1)
+
+
+def diagnostico_union(nombre: str,
+                      claves_izquierda: np.ndarray,
+                      claves_derecha: np.ndarray,
+                      posiciones: np.ndarray,
+                      filas_salida: int) -> dict:
+    """
+    Resume una unión: filas de entrada y salida, claves sin pareja y claves duplicadas a la derecha.
+
+    Parámetros:
+    -----------
+    nombre : str
+        Nombre de la unión (por ejemplo 'A1B').
+    claves_izquierda, claves_derecha : np.ndarray
+        Claves de cada lado (una por fila).
+    posiciones : np.ndarray
+        Posición en la derecha de cada fila de la izquierda (-1 sin pareja).
+    filas_salida : int
+        Filas del resultado.
+
+    Retorna:
+    --------
+    dict
+        Una fila de la tabla de diagnóstico.
+    """
+    sin_pareja = posiciones < 0
+    return {
+        'union': nombre,
+        'filas_izquierda': len(claves_izquierda),
+        'filas_derecha': len(claves_derecha),
+        'filas_salida': filas_salida,
+        'filas_sin_pareja': int(sin_pareja.sum()),
+        'claves_sin_pareja': int(pd.unique(claves_izquierda[sin_pareja]).size),
+        'claves_duplicadas_derecha': int(pd.Series(claves_derecha).dropna().duplicated().sum()),
+    }
+
+
+def unir_por_clave(izquierda: pd.DataFrame,
+                   derecha: pd.DataFrame,
+                   left_on: str,
+                   right_on: str = None,
+                   how: str = 'inner',
+                   nombre: str = None,
+                   diagnosticos: list = None) -> pd.DataFrame:
+    """
+    Une por una clave entera como `pd.merge`, indexando una sola vez la clave de la tabla derecha y
+    recolectando sus filas por posición.
+
+    Pensada para tablas de dimensión (set C y set E por RBD, set A por mrun): la posición de la pareja
+    de cada fila de la izquierda se obtiene con `_posiciones` y las columnas de la derecha se toman con
+    un solo `take`, sin reordenar la izquierda. Las claves faltantes (NaN) no se emparejan entre sí.
+    Si la derecha tiene claves repetidas, se usa `pd.merge` (y el diagnóstico las reporta).
+
+    Parámetros:
+    -----------
+    izquierda, derecha : pd.DataFrame
+        Tablas a unir; el orden de filas del resultado es el de `izquierda`.
+    left_on : str
+        Clave en `izquierda`.
+    right_on : str, opcional
+        Clave en `derecha`. Por defecto, la misma que `left_on` (y aparece una sola vez en el resultado).
+    how : str
+        'inner' o 'left'.
+    nombre : str, opcional
+        Nombre de la unión en el diagnóstico.
+    diagnosticos : list, opcional
+        Lista a la que se agrega el diagnóstico de la unión (ver `diagnostico_union`).
+
+    Retorna:
+    --------
+    pd.DataFrame
+        Resultado de la unión, con las mismas columnas que `pd.merge` (sufijos '_x' e '_y').
+    """
+    if how not in ('inner', 'left'):
+        raise ValueError(f"Tipo de unión no soportado: {how!r}. Opciones: ['inner', 'left']")
+    right_on = right_on or left_on
+
+    claves_izquierda = _claves_numericas(izquierda[left_on])
+    claves_derecha = _claves_numericas(derecha[right_on])
+
+    posiciones = _posiciones(claves_derecha, claves_izquierda)
+    if posiciones is None:
+        # Derecha con claves repetidas (no es una tabla de dimensión): se delega en `pd.merge`, sin las
+        # filas de la derecha con clave faltante para que tampoco se emparejen NaN con NaN
+        posiciones = np.where(np.isin(claves_izquierda, claves_derecha[~np.isnan(claves_derecha)]), 0, -1)
+        resultado = pd.merge(izquierda, derecha[~np.isnan(claves_derecha)], left_on=left_on, right_on=right_on, how=how)
+    else:
+        filas = posiciones >= 0 if how == 'inner' else slice(None)
+        columnas_derecha = [c for c in derecha.columns if not (c == right_on and right_on == left_on)]
+        comunes = set(izquierda.columns) & set(columnas_derecha)
+
+        base = izquierda[filas] if how == 'inner' else izquierda
+        agregadas = derecha[columnas_derecha].reset_index(drop=True)
+        agregadas = agregadas.take(posiciones[filas]) if how == 'inner' or (posiciones >= 0).all() \
+            else agregadas.reindex(posiciones)
+        resultado = pd.concat([
+            base.reset_index(drop=True).rename(columns={c: f"{c}_x" for c in comunes}),
+            agregadas.reset_index(drop=True).rename(columns={c: f"{c}_y" for c in comunes}),
+        ], axis=1)
+
+    if diagnosticos is not None:
+        diagnosticos.append(diagnostico_union(nombre or f"{left_on}-{right_on}", claves_izquierda,
+                                              claves_derecha, posiciones, len(resultado)))
+
+    return resultado
+
+
+def unir_por_columnas(izquierda: pd.DataFrame,
+                      derecha: pd.DataFrame,
+                      left_on: list,
+                      right_on: list,
+                      how: str = 'left',
+                      nombre: str = None,
+                      diagnosticos: list = None) -> pd.DataFrame:
+    """
+    `pd.merge` por varias columnas de texto (por ejemplo, las claves de sede) con el mismo diagnóstico
+    que `unir_por_clave`. Las claves compuestas se codifican como enteros antes de medir la cobertura.
+    """
+    codigos, _ = pd.factorize(pd.MultiIndex.from_frame(
+        pd.concat([izquierda[left_on].astype(object), derecha[right_on].set_axis(left_on, axis=1).astype(object)])
+    ))
+    claves_izquierda = codigos[:len(izquierda)].astype('float64')
+    claves_derecha = codigos[len(izquierda):].astype('float64')
+    claves_izquierda[claves_izquierda < 0] = np.nan
+    claves_derecha[claves_derecha < 0] = np.nan
+
+    resultado = pd.merge(izquierda, derecha, left_on=left_on, right_on=right_on, how=how)
+
+    if diagnosticos is not None:
+        posiciones = np.where(np.isin(claves_izquierda, claves_derecha[~np.isnan(claves_derecha)]), 0, -1)
+        diagnosticos.append(diagnostico_union(nombre or '-'.join(left_on), claves_izquierda,
+                                              claves_derecha, posiciones, len(resultado)))
+
+    return resultado
+
+
+def tabla_diagnostico(diagnosticos: list, filas_base: int = None) -> pd.DataFrame:
+    """
+    Tabla de diagnóstico de una secuencia de uniones, con la cobertura acumulada respecto de `filas_base`
+    (por ejemplo, las filas de A1, como en la tabla de cobertura A1 -> A1B -> A1BCD -> A1BCDE).
+    """
+    tabla = pd.DataFrame(diagnosticos)
+    if filas_base and len(tabla):
+        tabla['% cobertura'] = (100 * tabla['filas_salida'] / filas_base).round(2)
+    return tabla